@@ -0,0 +1,63 @@
+"""Compares token_in_blocklist answered by the bloom filter with a Redis GET.
+
+Needs the app's environment and, for the Redis figure, a reachable REDIS_URL:
+
+    python -m benchmarks.jti_filter [--revoked 100000] [--lookups 100000]
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import redis.asyncio as aioredis
+
+from src.db.redis import JTI_FILTER_CAPACITY, RevokedJtiFilter, token_blocklist
+
+
+def bench_filter(revoked: int, lookups: int) -> None:
+    jti_filter = RevokedJtiFilter()
+
+    for _ in range(revoked):
+        jti_filter.add(str(uuid.uuid4()))
+
+    probes = [str(uuid.uuid4()) for _ in range(lookups)]
+
+    started = time.perf_counter()
+    false_positives = sum(jti_filter.might_contain(jti) for jti in probes)
+    elapsed = time.perf_counter() - started
+
+    print(f"filter: {elapsed / lookups * 1e6:.2f} us per lookup with {revoked} revoked JTIs "
+          f"(capacity {JTI_FILTER_CAPACITY}), {false_positives / lookups:.4%} false positives")
+
+
+async def bench_redis(lookups: int) -> None:
+    probes = [str(uuid.uuid4()) for _ in range(lookups)]
+
+    try:
+        started = time.perf_counter()
+
+        for jti in probes:
+            await token_blocklist.get(jti)
+
+        elapsed = time.perf_counter() - started
+
+    except (aioredis.RedisError, OSError) as e:
+        print(f"redis: skipped, {e}")
+        return
+
+    print(f"redis: {elapsed / lookups * 1e6:.2f} us per GET")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--revoked", type=int, default=JTI_FILTER_CAPACITY)
+    parser.add_argument("--lookups", type=int, default=100000)
+    parser.add_argument("--redis-lookups", type=int, default=5000)
+    args = parser.parse_args()
+
+    bench_filter(args.revoked, args.lookups)
+    asyncio.run(bench_redis(args.redis_lookups))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Compares the precompiled mail render path with plain Jinja rendering.
+
+Needs the app's environment:
+
+    python -m benchmarks.mail_render [--renders 20000] [--batch 50]
+"""
+import argparse
+import re
+import time
+
+from src.mail import BASE_DIR, MAIL_TEMPLATES, mail_renderer
+
+
+def sample_context(template_name: str) -> dict:
+    source = (BASE_DIR / "templates" / template_name).read_text()
+
+    return {name: f"O'Brien <{name}>" for name in re.findall(r"{{\s*(\w+)", source)}
+
+
+def per_render(seconds: float, renders: int) -> str:
+    return f"{seconds / renders * 1e6:.1f} us"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--renders", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=50)
+    args = parser.parse_args()
+
+    for template_name in MAIL_TEMPLATES:
+        compiled = mail_renderer.templates[template_name]
+        context = sample_context(template_name)
+
+        started = time.perf_counter()
+        for _ in range(args.renders):
+            compiled.template.render(**context)
+        jinja = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(args.renders):
+            compiled.render(context)
+        fast = time.perf_counter() - started
+
+        mails = [{"template_name": template_name, "context": context}] * args.batch
+        started = time.perf_counter()
+        for _ in range(args.renders // args.batch):
+            mail_renderer.render_many(mails)
+        batched = time.perf_counter() - started
+
+        print(f"{template_name}: jinja {per_render(jinja, args.renders)}, "
+              f"precompiled {per_render(fast, args.renders)}, "
+              f"render_many {per_render(batched, args.renders // args.batch * args.batch)} per mail")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,9 @@ from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import async_engine_from_config
 
 from alembic import context
-from src.bookings.models import Bookings
+from src.bookings.models import Bookings, BookingDailyStats
 from src.auth.models import User
+from src.invoice.models import Invoice, StripeCustomer, StripeEvent
 from sqlmodel import SQLModel
 from src.config import Config
 
@@ -30,6 +31,17 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = SQLModel.metadata
 
+# Kept by hand-written migrations but not mapped on the models, so autogenerate
+# must not try to drop them
+UNMAPPED_OBJECTS = {
+    "agreedPrice", "search_vector", "ix_bookings_search_vector", "ix_bookings_search_trgm",
+    "ix_users_username_prefix", "ix_users_email_prefix",
+}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    return not (reflected and compare_to is None and name in UNMAPPED_OBJECTS)
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -52,6 +64,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -61,7 +74,7 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
 
     with context.begin_transaction():
         context.run_migrations()
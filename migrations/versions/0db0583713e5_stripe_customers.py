@@ -0,0 +1,32 @@
+"""stripe_customers
+
+Revision ID: 0db0583713e5
+Revises: ba769bef4a54
+Create Date: 2025-03-05 16:41:08.217734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0db0583713e5'
+down_revision: Union[str, None] = 'ba769bef4a54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('stripe_customers',
+    sa.Column('email', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('customer_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('email')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('stripe_customers')
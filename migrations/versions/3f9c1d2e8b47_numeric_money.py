@@ -0,0 +1,60 @@
+"""numeric_money
+
+Revision ID: 3f9c1d2e8b47
+Revises: a7016857afe9
+Create Date: 2025-03-12 14:05:39.881204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c1d2e8b47'
+down_revision: Union[str, None] = 'a7016857afe9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Keeps agreed_price in step with "agreedPrice" while instances of the old
+# code, which only write the text column, are still running. Drop it together
+# with "agreedPrice" once every instance maps agreed_price.
+SYNC_FUNCTION = r'''
+CREATE FUNCTION bookings_sync_agreed_price() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' OR NEW.agreed_price IS NULL THEN
+        NEW.agreed_price := CASE
+            WHEN NEW."agreedPrice" IS NULL THEN 0
+            WHEN NEW."agreedPrice" ~ '^\s*-?[0-9]+(\.[0-9]+)?\s*$' THEN round(trim(NEW."agreedPrice")::numeric, 2)
+        END;
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+'''
+
+
+def upgrade() -> None:
+    # Filled from "agreedPrice" by `python -m src.bookings.maintenance backfill-agreed-price`
+    op.add_column('bookings', sa.Column('agreed_price', sa.NUMERIC(precision=12, scale=2), nullable=True))
+    op.execute(SYNC_FUNCTION)
+    op.execute('CREATE TRIGGER bookings_sync_agreed_price BEFORE INSERT OR UPDATE OF "agreedPrice" ON bookings '
+               'FOR EACH ROW EXECUTE FUNCTION bookings_sync_agreed_price()')
+    op.alter_column('invoices', 'amount',
+               existing_type=sa.Float(),
+               type_=sa.NUMERIC(precision=12, scale=2),
+               existing_nullable=False,
+               postgresql_using='round(amount::numeric, 2)')
+
+
+def downgrade() -> None:
+    op.alter_column('invoices', 'amount',
+               existing_type=sa.NUMERIC(precision=12, scale=2),
+               type_=sa.Float(),
+               existing_nullable=False)
+    op.execute('DROP TRIGGER bookings_sync_agreed_price ON bookings')
+    op.execute('DROP FUNCTION bookings_sync_agreed_price()')
+    op.execute('UPDATE bookings SET "agreedPrice" = agreed_price::text WHERE agreed_price IS NOT NULL')
+    op.drop_column('bookings', 'agreed_price')
@@ -0,0 +1,30 @@
+"""user_prefix_indexes
+
+Revision ID: 6b2d84f1e9c3
+Revises: c51e7a9d3b60
+Create Date: 2025-03-17 09:12:48.563901
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b2d84f1e9c3'
+down_revision: Union[str, None] = 'c51e7a9d3b60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Pattern ops let lower(...) LIKE 'prefix%' use the index under any collation
+    op.execute('CREATE INDEX ix_users_username_prefix ON users (lower(username) text_pattern_ops)')
+    op.execute('CREATE INDEX ix_users_email_prefix ON users (lower(email) text_pattern_ops)')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_email_prefix', table_name='users')
+    op.drop_index('ix_users_username_prefix', table_name='users')
@@ -0,0 +1,33 @@
+"""booking_created_at_not_null
+
+Revision ID: 90ad7727bdd1
+Revises: e83a5c07d219
+Create Date: 2025-03-21 11:02:37.914520
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '90ad7727bdd1'
+down_revision: Union[str, None] = 'e83a5c07d219'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keyset pagination orders and encodes cursors by created_at, so it can never be NULL
+    op.execute("UPDATE bookings SET created_at = coalesce(updated_at, now()) WHERE created_at IS NULL")
+    op.alter_column('bookings', 'created_at',
+               existing_type=sa.TIMESTAMP(),
+               nullable=False)
+
+
+def downgrade() -> None:
+    op.alter_column('bookings', 'created_at',
+               existing_type=sa.TIMESTAMP(),
+               nullable=True)
@@ -0,0 +1,48 @@
+"""booking_daily_stats
+
+Revision ID: a7016857afe9
+Revises: 08e69c2f0d87
+Create Date: 2025-03-10 09:48:17.302655
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7016857afe9'
+down_revision: Union[str, None] = '08e69c2f0d87'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('booking_daily_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('status', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('service', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('bookings', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.NUMERIC(precision=14, scale=2), nullable=False),
+    sa.Column('distinct_emails', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=True),
+    sa.PrimaryKeyConstraint('day', 'status', 'service')
+    )
+    # Text prices that are not numbers count as 0 rather than aborting the backfill
+    op.execute(
+        r"""
+        INSERT INTO booking_daily_stats (day, status, service, bookings, revenue, distinct_emails, updated_at)
+        SELECT created_at::date, coalesce(status, ''), service, count(*),
+               coalesce(sum(CASE WHEN "agreedPrice" ~ '^\s*-?[0-9]+(\.[0-9]+)?\s*$'
+                                 THEN trim("agreedPrice")::numeric END), 0),
+               count(DISTINCT email), now()
+        FROM bookings
+        GROUP BY 1, 2, 3
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('booking_daily_stats')
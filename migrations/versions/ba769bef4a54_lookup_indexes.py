@@ -0,0 +1,43 @@
+"""lookup_indexes
+
+Revision ID: ba769bef4a54
+Revises: 5970620d4c15
+Create Date: 2025-03-03 10:12:41.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ba769bef4a54'
+down_revision: Union[str, None] = '5970620d4c15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Built concurrently so writes to these busy tables are not blocked meanwhile;
+    # CREATE INDEX CONCURRENTLY cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_email', 'users', ['email'], unique=True, postgresql_concurrently=True)
+        op.create_index('ix_users_username', 'users', ['username'], unique=True, postgresql_concurrently=True)
+        op.create_index('ix_bookings_email', 'bookings', ['email'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_bookings_created_at_uid', 'bookings', ['created_at', 'uid'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_bookings_status_created_at', 'bookings', ['status', 'created_at'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_bookings_user_uid_created_at', 'bookings', ['user_uid', 'created_at'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_invoices_stripe_invoice_id', 'invoices', ['stripe_invoice_id'], unique=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_invoices_stripe_invoice_id', table_name='invoices', postgresql_concurrently=True)
+        op.drop_index('ix_bookings_user_uid_created_at', table_name='bookings', postgresql_concurrently=True)
+        op.drop_index('ix_bookings_status_created_at', table_name='bookings', postgresql_concurrently=True)
+        op.drop_index('ix_bookings_created_at_uid', table_name='bookings', postgresql_concurrently=True)
+        op.drop_index('ix_bookings_email', table_name='bookings', postgresql_concurrently=True)
+        op.drop_index('ix_users_username', table_name='users', postgresql_concurrently=True)
+        op.drop_index('ix_users_email', table_name='users', postgresql_concurrently=True)
@@ -0,0 +1,50 @@
+"""booking_search
+
+Revision ID: c51e7a9d3b60
+Revises: 3f9c1d2e8b47
+Create Date: 2025-03-14 10:31:22.417095
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c51e7a9d3b60'
+down_revision: Union[str, None] = '3f9c1d2e8b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute(
+        """
+        ALTER TABLE bookings ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce("firstName", '') || ' ' || coalesce("lastName", '') || ' ' || coalesce(email, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce("phoneNumber", '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(pickup_address, '') || ' ' || coalesce(dropoff_address, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'C')
+        ) STORED
+        """
+    )
+    op.execute('CREATE INDEX ix_bookings_search_vector ON bookings USING gin (search_vector)')
+    # Must match BOOKING_SEARCH_TEXT in src/bookings/models.py
+    op.execute(
+        """
+        CREATE INDEX ix_bookings_search_trgm ON bookings USING gin ((
+            lower(coalesce("firstName", '') || ' ' || coalesce("lastName", '') || ' ' ||
+                  coalesce(email, '') || ' ' || coalesce("phoneNumber", '') || ' ' ||
+                  coalesce(pickup_address, '') || ' ' || coalesce(dropoff_address, ''))
+        ) gin_trgm_ops)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_bookings_search_trgm', table_name='bookings')
+    op.drop_index('ix_bookings_search_vector', table_name='bookings')
+    op.drop_column('bookings', 'search_vector')
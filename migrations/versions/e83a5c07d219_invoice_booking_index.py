@@ -0,0 +1,27 @@
+"""invoice_booking_index
+
+Revision ID: e83a5c07d219
+Revises: 6b2d84f1e9c3
+Create Date: 2025-03-18 15:40:06.218774
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e83a5c07d219'
+down_revision: Union[str, None] = '6b2d84f1e9c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_invoices_booking_uid'), 'invoices', ['booking_uid'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_invoices_booking_uid'), table_name='invoices')
@@ -1,20 +1,47 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from src.bookings.routes import booking_router
 from src.invoice.routes import invoice_router
-from src.db.main import init_db
+from src.db.main import init_db, track_recent_writes
 from src.auth.routes import auth_router
+from src.auth.cache import listen_for_invalidations
+from src.db.redis import sync_revoked_jtis
+from src.invoice.webhooks import consume_stripe_events
+from src.config import Config
+from src import mail_worker
 from fastapi.middleware.cors import CORSMiddleware
 
 version = "v1"
 description=""
 
 
+@asynccontextmanager
+async def life_span(app: FastAPI):
+    auth_invalidations = asyncio.create_task(listen_for_invalidations())
+    revoked_jti_sync = asyncio.create_task(sync_revoked_jtis())
+    stripe_events = asyncio.create_task(consume_stripe_events())
+
+    # The in-process queue is only visible to this process, so it is drained here
+    local_mail = None
+    if Config.MAIL_QUEUE_BACKEND == "local":
+        local_mail = asyncio.create_task(mail_worker.run())
+
+    yield
+
+    auth_invalidations.cancel()
+    revoked_jti_sync.cancel()
+    stripe_events.cancel()
+
+    if local_mail is not None:
+        local_mail.cancel()
 
 
 app = FastAPI(
     title="Moving Website API",
     description=description,
     version=version,
+    lifespan=life_span,
 )
 
 # Define allowed origins (you can set "*" to allow all)
@@ -29,6 +56,8 @@ origins = [
     "https://yourfrontenddomain.com",  # Add your production frontend domain
 ]
 
+app.middleware("http")(track_recent_writes)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import logging
+from typing import Any
+
+from src.config import Config
+from src.db.cache import LRUCache
+from src.db.redis import token_blocklist
+
+AUTH_INVALIDATION_CHANNEL = "auth:invalidate"
+
+
+class TTLCache(LRUCache):
+    """LRUCache whose entries expire after ``ttl`` seconds.
+
+    The cache only serves entries while ``enabled`` is set, which the
+    invalidation listener does once it is subscribed to Redis. A worker that
+    cannot hear invalidations therefore never answers from stale entries.
+    """
+
+    def __init__(self, ttl: int, maxsize: int) -> None:
+        super().__init__(maxsize, ttl)
+        self.enabled = False
+
+    def get(self, key: str) -> Any:
+        if not self.enabled:
+            return None
+
+        return super().get(key)
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        if self.enabled:
+            super().set(key, value, ttl)
+
+
+# jti -> True for tokens already checked against the blocklist
+verified_tokens = TTLCache(ttl=Config.AUTH_CACHE_TTL, maxsize=Config.AUTH_CACHE_SIZE)
+
+# email -> User loaded by get_current_user
+user_principals = TTLCache(ttl=Config.AUTH_CACHE_TTL, maxsize=Config.AUTH_CACHE_SIZE)
+
+
+def apply_invalidation(data: bytes | str) -> None:
+    message = json.loads(data)
+
+    if message["kind"] == "jti":
+        verified_tokens.pop(message["value"])
+    elif message["kind"] == "user":
+        user_principals.pop(message["value"])
+
+
+async def publish_invalidation(kind: str, value: str) -> None:
+    message = json.dumps({"kind": kind, "value": value})
+
+    apply_invalidation(message)
+    await token_blocklist.publish(AUTH_INVALIDATION_CHANNEL, message)
+
+
+async def invalidate_token(jti: str) -> None:
+    await publish_invalidation("jti", jti)
+
+
+async def invalidate_user(email: str) -> None:
+    await publish_invalidation("user", email)
+
+
+def set_caches_enabled(enabled: bool) -> None:
+    for cache in (verified_tokens, user_principals):
+        cache.enabled = enabled
+        cache.clear()
+
+
+async def listen_for_invalidations() -> None:
+    """Keeps this worker's auth caches in sync with writes made by other workers."""
+    while True:
+        pubsub = token_blocklist.pubsub(ignore_subscribe_messages=True)
+
+        try:
+            await pubsub.subscribe(AUTH_INVALIDATION_CHANNEL)
+            set_caches_enabled(True)
+
+            async for message in pubsub.listen():
+                apply_invalidation(message["data"])
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as e:
+            logging.error(str(e))
+            await asyncio.sleep(1)
+
+        finally:
+            set_caches_enabled(False)
+            await pubsub.aclose()
@@ -7,6 +7,7 @@ from fastapi import Depends
 from src.db.main import get_session
 from .services import UserService
 from src.db.redis import token_blocklist,token_in_blocklist
+from .cache import user_principals, verified_tokens
 from typing import Any, List
 from .models import User
 
@@ -19,31 +20,35 @@ class TokenBearer(HTTPBearer):
         super().__init__(auto_error = auto_error)
 
     async def __call__(self, request: Request) -> HTTPAuthorizationCredentials | None:
-        creds = await super().__call__(request)
+        # Routes often depend on several bearers (directly and through
+        # RoleChecker), so the verified token is kept on the request
+        token_data = getattr(request.state, "token_data", None)
 
-        token = creds.credentials
+        if token_data is None:
+            creds = await super().__call__(request)
 
-        token_data = decode_token(token)
+            token_data = decode_token(creds.credentials)
 
-        if not self.token_valid(token):
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail={
-                "error":"Invalid token",
-                "resolution":"Please get new token"
-            })
-        
-        if await token_in_blocklist(token_data['jti']):
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail={
-                "error":"Token has been revoked",
-                "resolution":"Please get new token"
-            })
+            if token_data is None:
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail={
+                    "error":"Invalid token",
+                    "resolution":"Please get new token"
+                })
+
+            if not verified_tokens.get(token_data['jti']):
+                if await token_in_blocklist(token_data['jti']):
+                    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail={
+                        "error":"Token has been revoked",
+                        "resolution":"Please get new token"
+                    })
+
+                verified_tokens.set(token_data['jti'], True)
+
+            request.state.token_data = token_data
 
         self.verify_token_data(token_data)
 
         return token_data
-    def token_valid(self, token: str) -> bool:
-        token_data = decode_token(token)
-
-        return True if token_data is not None else False
     
     def verify_token_data(self, token_data):
         raise NotImplementedError("Please override this method in child classes")
@@ -68,7 +73,13 @@ async def get_current_user(
 ):
     user_email = token_details["user"]["email"]
 
-    user = await user_service.get_user_by_email(user_email, session)
+    user = user_principals.get(user_email)
+
+    if user is None:
+        user = await user_service.get_user_by_email(user_email, session)
+
+        if user is not None:
+            user_principals.set(user_email, user)
 
     return user
 
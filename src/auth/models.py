@@ -15,8 +15,8 @@ class User(SQLModel, table=True):
 			default=uuid.uuid4
 		)
 	)
-	username : str
-	email : str
+	username : str = Field(unique=True, index=True)
+	email : str = Field(unique=True, index=True)
 	first_name: str
 	last_name : str
 	role : str = Field(
@@ -1,18 +1,20 @@
-from fastapi import APIRouter,Depends,status
+from fastapi import APIRouter,Depends,Query,status
 
 from src.bookings.service import BookingService
-from .schemas import UserCreateModel, UserModel, UserLoginModel, CurrentUser, EmailModel, PasswordResetRequestModel, PasswordResetConfirmModel
-from .services import UserService
-from src.db.main import get_session
+from .schemas import UserCreateModel, UserPage, UserLoginModel, CurrentUser, EmailModel, PasswordResetRequestModel, PasswordResetConfirmModel
+from .services import UserService, USER_LIST_FIELDS
+from src.db.main import get_session, get_read_session, unit_of_work
+from src.db.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_uid_cursor
 from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi.exceptions import HTTPException
-from typing import List
-from .utils import create_access_token, decode_token, verify_password, create_url_safe_token, decode_url_safe_token,generate_passwd_hash
+from typing import Optional
+from .utils import password_hash_stats, create_access_token, decode_token, verify_and_update_password, create_url_safe_token, decode_url_safe_token,generate_passwd_hash_async
 from datetime import timedelta,datetime
 from fastapi.responses import JSONResponse, RedirectResponse
 from .dependencies import RefreshTokenBearer,AccessTokenBearer, get_current_user,RoleChecker
 from src.db.redis import add_jti_to_blocklist
-from src.mail import mail, create_message
+from .cache import invalidate_token, invalidate_user
+from src.mail_queue import enqueue_mail
 from src.config import Config
 
 
@@ -65,24 +67,50 @@ async def create_user_Account(user_data:UserCreateModel, session: AsyncSession =
 
 	link = f"https://{Config.DOMAIN}/api/v1/auth/verify/{token}"
 
-	message = create_message(
+	await enqueue_mail(
         recipients=[email],
         subject="Verify Your Email",
         template_name="verify-email.html",
         context={"name": username, "verification_link": link},
     )
-	await mail.send_message(message, template_name="verify-email.html")
 
 	return {
 		"message": "User created successfully. Check your email to verify your account",
 		"user": new_user
 	}
 
-@auth_router.get("/get_all_users", response_model=list[UserModel])
-async def get_all_users(session:AsyncSession = Depends(get_session), _=Depends(AccessTokenBearer()),__:bool = Depends(admin_role_checker)):
-	users = await user_service.get_all_users(session)
+@auth_router.get("/get_all_users", response_model=UserPage, response_model_exclude_unset=True)
+async def get_all_users(
+	limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+	cursor: Optional[str] = None,
+	role: Optional[str] = None,
+	is_verified: Optional[bool] = None,
+	q: Optional[str] = Query(default=None, min_length=1, max_length=40),
+	fields: Optional[str] = Query(default=None, description="Comma-separated columns to return; uid is always included"),
+	session:AsyncSession = Depends(get_read_session), _=Depends(AccessTokenBearer()),__:bool = Depends(admin_role_checker)):
 
-	return users
+	cursor_uid = None
+	if cursor:
+		cursor_uid = decode_uid_cursor(cursor)
+
+		if cursor_uid is None:
+			raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+	field_list = None
+	if fields:
+		field_list = [field.strip() for field in fields.split(",") if field.strip()]
+		unknown = [field for field in field_list if field not in USER_LIST_FIELDS]
+
+		if unknown:
+			raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields: {', '.join(unknown)}")
+
+	return await user_service.get_all_users(session, limit, cursor_uid, role, is_verified, q, field_list)
+
+
+@auth_router.get("/password-hash-stats")
+async def get_password_hash_stats(_=Depends(AccessTokenBearer()),__:bool = Depends(admin_role_checker)):
+	""" How long hashes waited for a free bcrypt thread; each worker process keeps its own figures """
+	return {**password_hash_stats.snapshot(), "pool_size": Config.PASSWORD_HASH_WORKERS}
 
 @auth_router.get("/verify/{token}")
 async def verify_email(token:str, session: AsyncSession = Depends(get_session)):
@@ -101,11 +129,13 @@ async def verify_email(token:str, session: AsyncSession = Depends(get_session)):
 				status_code=status.HTTP_200_OK
 				)
 		
-		await user_service.update_user(user, {"is_verified": True}, session)
-
 		user_uid = user.uid
 
-		await booking_service.link_booking_to_user(user_uid,user_email, session)
+		async with unit_of_work(session):
+			await user_service.update_user(user, {"is_verified": True}, session, commit=False)
+			await booking_service.link_booking_to_user(user_uid,user_email, session, commit=False)
+
+		await invalidate_user(user_email)
 
 		return RedirectResponse(
 			url="https://blackbrosdelivery.ca/login",
@@ -125,9 +155,12 @@ async def login_user(login_data:UserLoginModel, session: AsyncSession = Depends(
 	user = await user_service.get_user_by_email(email, session)
 
 	if user is not None:
-		password_valid = verify_password(password, user.password_hash)
+		password_valid, new_password_hash = await verify_and_update_password(password, user.password_hash)
 
 		if password_valid:
+			if new_password_hash:
+				await user_service.update_user(user, {"password_hash": new_password_hash}, session)
+
 			access_token = create_access_token(
 				user_data={
 					"first_name": user.first_name,
@@ -179,6 +212,7 @@ async def revoke_token(token_details: dict = Depends(AccessTokenBearer())):
 	jti = token_details['jti']
 
 	await add_jti_to_blocklist(jti)
+	await invalidate_token(jti)
 
 	return JSONResponse(
 		content={
@@ -219,13 +253,12 @@ async def password_reset_request(email:PasswordResetRequestModel):
 
 	link = f"https://blackbrosdelivery.ca/password-reset-confirm/{token}"
 
-	message = create_message(
+	await enqueue_mail(
         recipients=[email],
         subject="Reset Your Password",
         template_name="reset-password.html",
         context={"name": email, "verification_link": link},
     )
-	await mail.send_message(message, template_name="reset-password.html")
 
 	return JSONResponse(content={
 		"message": "Password reset link sent successfully"
@@ -236,7 +269,7 @@ async def password_reset_confirm(token:str, password:PasswordResetConfirmModel,
 	token_data = decode_url_safe_token(token)
 
 	new_password = password.new_password
-	password_hash = generate_passwd_hash(new_password)
+	password_hash = await generate_passwd_hash_async(new_password)
 
 	user_email = token_data.get("email")
 
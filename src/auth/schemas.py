@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel, Field, EmailStr
 
@@ -35,6 +35,22 @@ class UserModel(BaseModel):
     password_hash: str = Field(exclude=True)
 
 
+class UserListItem(BaseModel):
+    """A user row where only the requested ``fields`` are set."""
+    uid: Optional[uuid.UUID] = None
+    username: Optional[str] = None
+    email: Optional[str] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    role: Optional[str] = None
+    is_verified: Optional[bool] = None
+
+
+class UserPage(BaseModel):
+    users: List[UserListItem]
+    next_cursor: Optional[str] = None
+
+
 # class UserBooksModel(UserModel):
 #     books: List[Book]
 #     reviews: List[ReviewModel]
@@ -1,8 +1,18 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
+import uuid
+from typing import Optional
+
+from sqlalchemy import func, or_
 from sqlmodel import select
 from .schemas import UserCreateModel
 from .models import User
-from .utils import generate_passwd_hash
+from .utils import generate_passwd_hash_async
+from .cache import invalidate_user
+from src.db.pagination import DEFAULT_PAGE_SIZE, LIKE_ESCAPE, encode_uid_cursor, escape_like
+
+# Columns the user listing may project; never the password hash
+USER_LIST_FIELDS = ["uid", "username", "email", "first_name", "last_name", "role", "is_verified"]
+
 
 class UserService:
 	async def get_user_by_email(self, email : str, session : AsyncSession):
@@ -41,7 +51,7 @@ class UserService:
 			**user_data_dict
 		)
 
-		new_user.password_hash = generate_passwd_hash(user_data_dict['password'])
+		new_user.password_hash = await generate_passwd_hash_async(user_data_dict['password'])
 		new_user.role = 'user'
 
 		session.add(new_user)
@@ -51,18 +61,45 @@ class UserService:
 		return new_user
 
 
-	async def get_all_users(self, session : AsyncSession):
-			statement = select(User)
+	async def get_all_users(self, session : AsyncSession, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[uuid.UUID] = None, role: Optional[str] = None, is_verified: Optional[bool] = None, search: Optional[str] = None, fields: Optional[list[str]] = None):
+			""" Returns one page of users in uid order with only ``fields`` selected, plus the cursor of the next page """
+			columns = [getattr(User, field) for field in dict.fromkeys(["uid", *(fields or USER_LIST_FIELDS)])]
+
+			filters = []
+
+			if role:
+				filters.append(User.role == role)
+			if is_verified is not None:
+				filters.append(User.is_verified == is_verified)
+			if search:
+				# Served by the lower(...) text_pattern_ops indexes
+				prefix = escape_like(search.lower()) + "%"
+				filters.append(or_(func.lower(User.username).like(prefix, escape=LIKE_ESCAPE), func.lower(User.email).like(prefix, escape=LIKE_ESCAPE)))
+			if cursor:
+				filters.append(User.uid > cursor)
+
+			statement = select(*columns).where(*filters).order_by(User.uid).limit(limit + 1)
 
 			result = await session.exec(statement)
 
-			return result.all()
+			users = [dict(row._mapping) for row in result.all()]
+
+			next_cursor = None
+			if len(users) > limit:
+				users = users[:limit]
+				next_cursor = encode_uid_cursor(users[-1]["uid"])
+
+			return {"users": users, "next_cursor": next_cursor}
 	
 
-	async def update_user(self, user:User, user_data: dict, session: AsyncSession):
+	async def update_user(self, user:User, user_data: dict, session: AsyncSession, commit: bool = True):
 		
 		for k, v in user_data.items():
 			setattr(user, k, v)
 
-		await session.commit()
+		# Without a commit here the caller invalidates once its transaction commits
+		if commit:
+			await session.commit()
+
+			await invalidate_user(user.email)
 		return user
\ No newline at end of file
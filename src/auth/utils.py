@@ -1,5 +1,9 @@
+import asyncio
 import logging
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from itsdangerous import URLSafeTimedSerializer
 
@@ -8,20 +12,69 @@ from passlib.context import CryptContext
 
 from src.config import Config
 
-passwd_context = CryptContext(schemes=["bcrypt"])
+# Pinning min/max rounds to the configured cost makes needs_update() flag
+# hashes created with any other cost, so they get rehashed on login
+passwd_context = CryptContext(
+    schemes=["bcrypt"],
+    bcrypt__default_rounds=Config.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=Config.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=Config.BCRYPT_ROUNDS,
+)
+
+# bcrypt releases the GIL, so a thread pool keeps hashing off the event loop
+# while max_workers caps how many hashes run at once per worker process
+password_hash_executor = ThreadPoolExecutor(
+    max_workers=Config.PASSWORD_HASH_WORKERS, thread_name_prefix="passwd-hash"
+)
+
+
+class PasswordHashStats:
+    """Time spent waiting for a free hashing thread."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.queue_seconds_total = 0.0
+        self.queue_seconds_max = 0.0
+
+    def record(self, queue_seconds: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self.queue_seconds_total += queue_seconds
+            self.queue_seconds_max = max(self.queue_seconds_max, queue_seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "queue_seconds_avg": self.queue_seconds_total / self.calls if self.calls else 0.0,
+                "queue_seconds_max": self.queue_seconds_max,
+            }
+
+
+password_hash_stats = PasswordHashStats()
 
 
 ACCESS_TOKEN_EXPIRY = 3600
 
 
-def generate_passwd_hash(password: str) -> str:
-    hash = passwd_context.hash(password)
+async def run_in_hash_pool(func, *args):
+    submitted_at = time.perf_counter()
+
+    def timed():
+        password_hash_stats.record(time.perf_counter() - submitted_at)
+        return func(*args)
+
+    return await asyncio.get_running_loop().run_in_executor(password_hash_executor, timed)
+
 
-    return hash
+async def generate_passwd_hash_async(password: str) -> str:
+    return await run_in_hash_pool(passwd_context.hash, password)
 
 
-def verify_password(password: str, hash: str) -> bool:
-    return passwd_context.verify(password, hash)
+async def verify_and_update_password(password: str, hash: str) -> tuple[bool, str | None]:
+    """Returns whether the password matches and, if its cost is outdated, a new hash."""
+    return await run_in_hash_pool(passwd_context.verify_and_update, password, hash)
 
 
 def create_access_token(
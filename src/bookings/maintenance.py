@@ -0,0 +1,182 @@
+import argparse
+import asyncio
+import logging
+import uuid
+from datetime import date
+
+from sqlalchemy import Numeric, String, case, cast, column, desc, func, select, table, text, update
+from sqlalchemy.dialects import postgresql
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.auth.models import User
+from src.db.main import SessionLocal
+from src.invoice.models import Invoice
+from .models import Bookings
+from .service import BookingService
+from .stats import rebuild_daily_stats
+
+# The text price column the numeric agreed_price replaced; no longer mapped on Bookings
+legacy_bookings = table("bookings", column("uid"), column("agreedPrice", String), column("agreed_price", Numeric))
+
+PRICE_PATTERN = r"^\s*-?[0-9]+(\.[0-9]+)?\s*$"
+
+
+async def backfill_agreed_price(session: AsyncSession, chunk_size: int) -> int:
+	""" Copies "agreedPrice" into agreed_price in uid order, committing each chunk; returns the rows filled.
+
+	Rows already holding an agreed_price are left alone, so the command can be
+	rerun or resumed. Text that is not a number is left NULL and reported.
+	Writes made after the numeric_money migration are synced by its trigger,
+	so one pass run after that migration covers every row.
+	"""
+	uid = legacy_bookings.c.uid
+	legacy_price = legacy_bookings.c.agreedPrice
+
+	converted = case(
+		(legacy_price.is_(None), 0),
+		(legacy_price.regexp_match(PRICE_PATTERN), func.round(cast(func.trim(legacy_price), Numeric), 2)),
+	)
+
+	last_uid = None
+	filled = 0
+
+	while True:
+		statement = select(uid).order_by(uid).limit(chunk_size)
+
+		if last_uid is not None:
+			statement = statement.where(uid > last_uid)
+
+		result = await session.execute(statement)
+		uids = result.scalars().all()
+
+		if not uids:
+			break
+
+		result = await session.execute(
+			update(legacy_bookings)
+			.where(uid >= uids[0], uid <= uids[-1], legacy_bookings.c.agreed_price.is_(None))
+			.values(agreed_price=converted)
+		)
+		await session.commit()
+
+		filled += result.rowcount
+		last_uid = uids[-1]
+
+		logging.info(f"Backfilled agreed_price up to booking {last_uid} ({filled} rows)")
+
+	statement = select(func.count()).select_from(legacy_bookings).where(legacy_bookings.c.agreed_price.is_(None))
+	result = await session.execute(statement)
+	unparsed = result.scalar_one()
+
+	if unparsed:
+		logging.warning(f"{unparsed} bookings have an agreedPrice that is not a number; their agreed_price is still NULL")
+
+	return filled
+
+
+def index_lookups() -> list[tuple[str, object]]:
+	""" The hot lookups from migration ba769bef4a54, each with the index it must be able to use """
+	return [
+		("ix_users_email", select(User).where(User.email == "someone@example.com")),
+		("ix_users_username", select(User).where(User.username == "someone")),
+		("ix_bookings_email", select(Bookings).where(Bookings.email == "someone@example.com")),
+		("ix_bookings_created_at_uid", select(Bookings).order_by(desc(Bookings.created_at), desc(Bookings.uid)).limit(20)),
+		("ix_bookings_status_created_at", select(Bookings).where(Bookings.status == "Pending").order_by(desc(Bookings.created_at)).limit(20)),
+		("ix_bookings_user_uid_created_at", select(Bookings).where(Bookings.user_uid == uuid.uuid4()).order_by(desc(Bookings.created_at)).limit(20)),
+		("ix_invoices_stripe_invoice_id", select(Invoice).where(Invoice.stripe_invoice_id == "in_0")),
+	]
+
+
+async def check_index_plans(session: AsyncSession) -> list[str]:
+	""" EXPLAINs each hot lookup and returns the indexes the planner did not use.
+
+	Sequential scans are disabled for the check, so the result does not depend
+	on how small the tables are in the database it runs against.
+	"""
+	await session.execute(text("SET LOCAL enable_seqscan = off"))
+
+	unused = []
+
+	for index, statement in index_lookups():
+		query = statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+		result = await session.execute(text(f"EXPLAIN {query}"))
+		plan = "\n".join(result.scalars().all())
+
+		if index not in plan:
+			logging.error(f"{index} is not used by its lookup:\n{plan}")
+			unused.append(index)
+
+	await session.rollback()
+
+	return unused
+
+
+async def check_index_plans_command(args: argparse.Namespace) -> None:
+	async with SessionLocal() as session:
+		unused = await check_index_plans(session)
+
+	if unused:
+		raise SystemExit(f"Lookups no longer use: {', '.join(unused)}")
+
+	logging.info("Every hot lookup uses its index")
+
+
+async def link_guest_bookings_command(args: argparse.Namespace) -> None:
+	""" Links historical guest bookings to the accounts later registered with their email """
+	booking_service = BookingService()
+	linked = 0
+
+	async with SessionLocal() as session:
+		while True:
+			chunk = await booking_service.link_guest_bookings(session, args.chunk_size)
+
+			if not chunk:
+				break
+
+			linked += chunk
+			logging.info(f"Linked {linked} guest bookings so far")
+
+	logging.info(f"Linked {linked} guest bookings")
+
+
+async def backfill_agreed_price_command(args: argparse.Namespace) -> None:
+	async with SessionLocal() as session:
+		filled = await backfill_agreed_price(session, args.chunk_size)
+
+	logging.info(f"Backfilled agreed_price on {filled} bookings")
+
+
+async def rebuild_daily_stats_command(args: argparse.Namespace) -> None:
+	async with SessionLocal() as session:
+		groups = await rebuild_daily_stats(session, args.date_from, args.date_to)
+
+	logging.info(f"Rebuilt {groups} booking_daily_stats rows")
+
+
+def build_parser() -> argparse.ArgumentParser:
+	parser = argparse.ArgumentParser(prog="python -m src.bookings.maintenance", description="Bookings maintenance tasks")
+	subcommands = parser.add_subparsers(dest="command", required=True)
+
+	rebuild = subcommands.add_parser("rebuild-daily-stats", help="Recompute booking_daily_stats from the bookings table")
+	rebuild.add_argument("--from", dest="date_from", type=date.fromisoformat, help="First day to rebuild (YYYY-MM-DD)")
+	rebuild.add_argument("--to", dest="date_to", type=date.fromisoformat, help="Day to stop before (YYYY-MM-DD)")
+	rebuild.set_defaults(handler=rebuild_daily_stats_command)
+
+	backfill = subcommands.add_parser("backfill-agreed-price", help="Copy the text agreedPrice column into the numeric agreed_price column")
+	backfill.add_argument("--chunk-size", type=int, default=1000, help="Bookings updated per transaction")
+	backfill.set_defaults(handler=backfill_agreed_price_command)
+
+	link = subcommands.add_parser("link-guest-bookings", help="Link bookings made without an account to the user registered with their email")
+	link.add_argument("--chunk-size", type=int, default=1000, help="Bookings linked per transaction")
+	link.set_defaults(handler=link_guest_bookings_command)
+
+	plans = subcommands.add_parser("check-index-plans", help="Fail if a hot lookup no longer uses its index")
+	plans.set_defaults(handler=check_index_plans_command)
+
+	return parser
+
+
+if __name__ == "__main__":
+	logging.basicConfig(level=logging.INFO)
+	args = build_parser().parse_args()
+	asyncio.run(args.handler(args))
@@ -1,13 +1,32 @@
-from sqlmodel import SQLModel,Field,Column
+from sqlmodel import SQLModel,Field,Column,Relationship
 import sqlalchemy.dialects.postgresql as pg
-from sqlalchemy import JSON
-from datetime import datetime
+from sqlalchemy import JSON, Index, literal_column
+from datetime import date, datetime
+from decimal import Decimal
 import uuid
 from typing import Optional, List
 
+from src.invoice.models import Invoice
+
+
+# Maintained by migrations rather than mapped: the generated tsvector column, and the
+# lowercased contact details the trigram index is built on. Queries must use the
+# exact expression below for the planner to pick that index.
+BOOKING_SEARCH_VECTOR = literal_column("bookings.search_vector")
+BOOKING_SEARCH_TEXT = literal_column(
+	"lower(coalesce(bookings.\"firstName\", '') || ' ' || coalesce(bookings.\"lastName\", '') || ' ' || "
+	"coalesce(bookings.email, '') || ' ' || coalesce(bookings.\"phoneNumber\", '') || ' ' || "
+	"coalesce(bookings.pickup_address, '') || ' ' || coalesce(bookings.dropoff_address, ''))"
+)
+
 
 class Bookings(SQLModel, table=True):
 	__tablename__ = "bookings"
+	__table_args__ = (
+		Index("ix_bookings_created_at_uid", "created_at", "uid"),
+		Index("ix_bookings_status_created_at", "status", "created_at"),
+		Index("ix_bookings_user_uid_created_at", "user_uid", "created_at"),
+	)
 
 	uid : uuid.UUID = Field(
 		sa_column= Column(
@@ -19,7 +38,7 @@ class Bookings(SQLModel, table=True):
 	)
 	firstName : str
 	lastName : str
-	email : str
+	email : str = Field(index=True)
 	phoneNumber : str
 	pickup_address : Optional[str]
 	dropoff_address : Optional[str]
@@ -30,10 +49,26 @@ class Bookings(SQLModel, table=True):
 	sub_services: List[str] = Field(sa_column=Column(JSON)) 
 	user_uid : Optional[uuid.UUID] = Field(default=None, foreign_key="users.uid",  nullable=True, ondelete="SET NULL")
 	status : Optional[str] = "Pending"
-	agreedPrice: Optional[str] = "0"
-	created_at : datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
-	updated_at : datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
+	agreedPrice: Decimal = Field(default=Decimal("0"), sa_column=Column("agreed_price", pg.NUMERIC(12, 2), nullable=True))
+	created_at : datetime = Field(default_factory=datetime.now, sa_column=Column(pg.TIMESTAMP, nullable=False, default=datetime.now))
+	updated_at : datetime = Field(default_factory=datetime.now, sa_column=Column(pg.TIMESTAMP, default=datetime.now))
+
+	# Never lazy loaded; query with selectinload(Bookings.invoices) to use it
+	invoices : List[Invoice] = Relationship(back_populates="booking", sa_relationship_kwargs={"lazy": "raise", "passive_deletes": True})
 
 
 	def __repr__(self):
-		return f"<Booking by user {self.user_uid} on {self.moving_date}>"
\ No newline at end of file
+		return f"<Booking by user {self.user_uid} on {self.moving_date}>"
+
+
+class BookingDailyStats(SQLModel, table=True):
+	""" Bookings per creation day, status and service, kept in step with the bookings table """
+	__tablename__ = "booking_daily_stats"
+
+	day : date = Field(primary_key=True)
+	status : str = Field(primary_key=True)
+	service : str = Field(primary_key=True)
+	bookings : int = 0
+	revenue : Decimal = Field(default=0, sa_column=Column(pg.NUMERIC(14, 2), nullable=False))
+	distinct_emails : int = 0
+	updated_at : datetime = Field(default_factory=datetime.now, sa_column=Column(pg.TIMESTAMP, default=datetime.now))
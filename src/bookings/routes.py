@@ -1,15 +1,17 @@
-from typing import List
-from fastapi import APIRouter, Depends, status
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, Query, status
 from fastapi.exceptions import HTTPException
 from sqlmodel.ext.asyncio.session import AsyncSession
-from datetime import datetime, timedelta
+from datetime import date, datetime
 
 from src.auth.models import User
-from src.bookings.schemas import Bookings, UpdateBooking,CreateBooking,UpdateBookingStatus,RescheduleBooking,AddPayment
-from src.db.main import get_session
+from src.bookings.schemas import Bookings, BookingPage, BookingSearchPage, UserBookingPage, UpdateBooking,CreateBooking,UpdateBookingStatus,RescheduleBooking,AddPayment
+from src.db.main import get_session, get_read_session
+from src.db.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor
 from .service import BookingService
+from .stats import period_count
 from src.auth.dependencies import AccessTokenBearer, RoleChecker, get_current_user
-from src.mail import mail, create_message
+from src.mail_queue import enqueue_mail
 
 
 
@@ -20,6 +22,45 @@ access_token_bearer = AccessTokenBearer()
 user_role_checker = RoleChecker(['admin','user'])
 admin_role_checker = RoleChecker(['admin'])
 
+# Deepest page a search may ask for; ranked results cannot use a keyset cursor
+MAX_SEARCH_OFFSET = 1000
+
+# Longest comparison window, in days, and how many one dashboard request may ask for
+MAX_DASHBOARD_WINDOW = 366
+MAX_DASHBOARD_WINDOWS = 5
+
+
+def check_dashboard_windows(windows: List[int]) -> List[int]:
+	if len(windows) > MAX_DASHBOARD_WINDOWS or any(days < 1 or days > MAX_DASHBOARD_WINDOW for days in windows):
+		raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail=f"Up to {MAX_DASHBOARD_WINDOWS} windows of 1 to {MAX_DASHBOARD_WINDOW} days are allowed")
+
+	return sorted(set(windows))
+
+
+# Most buckets one chart request may span, e.g. a year of days
+MAX_CHART_POINTS = 400
+
+# Charts stop short of date.max so the bucket after the last one can still be computed
+MAX_CHART_DATE = date(9999, 1, 1)
+
+
+def check_chart_period(start: Optional[date], end: Optional[date], granularity: str) -> tuple[date, date]:
+	""" Defaults to the current calendar year; charts cover [start, end) """
+	current_year = date.today().year
+	start = start or date(current_year, 1, 1)
+	end = end or date(current_year + 1, 1, 1)
+
+	if end <= start:
+		raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="end must be after start")
+
+	if end > MAX_CHART_DATE:
+		raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail=f"end must not be after {MAX_CHART_DATE}")
+
+	if period_count(start, end, granularity) > MAX_CHART_POINTS:
+		raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail=f"At most {MAX_CHART_POINTS} {granularity}s can be charted at once")
+
+	return start, end
+
 
 
 @booking_router.post("/new_booking", status_code=status.HTTP_201_CREATED, response_model=Bookings)
@@ -30,26 +71,49 @@ async def create_new_booking(booking_data: CreateBooking, session:AsyncSession =
 	names = new_booking.firstName + " " + booking_data.lastName
 	booking_uid = new_booking.uid
 	link = ""
-	message = create_message(
+	await enqueue_mail(
         recipients=[email],
         subject="Booking Confirmation",
-        template_name="verify-email.html",
+        template_name="booking-email.html",
         context={"names": names, "booking_uid": booking_uid, "link" : link},
     )
-	await mail.send_message(message, template_name="booking-email.html")
 
 	return new_booking
 
 
-@booking_router.get("/get_all_bookings", response_model = List[Bookings])
-async def get_all_bookings(session:AsyncSession = Depends(get_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(admin_role_checker)):
-	bookings = await booking_service.get_all_bookings(session)
+@booking_router.get("/get_all_bookings", response_model = BookingPage)
+async def get_all_bookings(
+	limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+	cursor: Optional[str] = None,
+	booking_status: Optional[str] = Query(default=None, alias="status"),
+	service: Optional[str] = None,
+	date_from: Optional[datetime] = None,
+	date_to: Optional[datetime] = None,
+	session:AsyncSession = Depends(get_read_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(admin_role_checker)):
+
+	cursor_data = None
+	if cursor:
+		cursor_data = decode_cursor(cursor)
+
+		if cursor_data is None:
+			raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="Invalid cursor")
+
+	return await booking_service.get_all_bookings(session, limit, cursor_data, booking_status, service, date_from, date_to)
 
-	return bookings
+
+@booking_router.get("/search", response_model = BookingSearchPage)
+async def search_bookings(
+	q: str = Query(min_length=2, max_length=200),
+	limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+	offset: int = Query(default=0, ge=0, le=MAX_SEARCH_OFFSET),
+	booking_status: Optional[str] = Query(default=None, alias="status"),
+	session:AsyncSession = Depends(get_read_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(admin_role_checker)):
+
+	return await booking_service.search_bookings(q, session, limit, offset, booking_status)
 
 
 @booking_router.get("/get_booking/{booking_uid}", response_model = Bookings)
-async def get_booking(booking_uid:str, session:AsyncSession = Depends(get_session)):
+async def get_booking(booking_uid:str, session:AsyncSession = Depends(get_read_session)):
 	booking = await booking_service.get_booking(booking_uid,session)
 
 	if booking is None:
@@ -58,15 +122,28 @@ async def get_booking(booking_uid:str, session:AsyncSession = Depends(get_sessio
 	else:
 		return booking
 
-@booking_router.get("/get_user_bookings/{user_uid}", response_model = List[Bookings])
-async def get_user_bookings(user_uid:str, session:AsyncSession = Depends(get_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(user_role_checker)):
-	bookings = await booking_service.get_user_bookings(user_uid,session)
+@booking_router.get("/get_user_bookings/{user_uid}", response_model = UserBookingPage, response_model_exclude_unset=True)
+async def get_user_bookings(
+	user_uid:str,
+	limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+	cursor: Optional[str] = None,
+	booking_status: Optional[str] = Query(default=None, alias="status"),
+	include: Optional[Literal["invoices"]] = None,
+	user: User = Depends(get_current_user),
+	session:AsyncSession = Depends(get_read_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(user_role_checker)):
 
-	if bookings is None:
-		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="Bookings not found")
+	# Booking history, and the invoices in it, is only shown to its owner and to admins
+	if user.role != "admin" and str(user.uid) != user_uid.lower():
+		raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,detail="Insufficient permission")
 
-	else:
-		return bookings
+	cursor_data = None
+	if cursor:
+		cursor_data = decode_cursor(cursor)
+
+		if cursor_data is None:
+			raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="Invalid cursor")
+
+	return await booking_service.get_user_bookings(user_uid, session, limit, cursor_data, booking_status, include == "invoices")
 
 
 @booking_router.patch("/update_booking/{booking_uid}", response_model=Bookings)
@@ -133,13 +210,12 @@ async def cancel_or_reject_booking(booking_uid:str, user: User = Depends(get_cur
 		names = booking.firstName + " " + booking.lastName
 		booking_uid = booking.uid
 		link = ""
-		message = create_message(
+		await enqueue_mail(
 			recipients=[email],
 			subject="Booking rejected",
 			template_name="cancel_reject.html",
 			context={"names": names, "booking_uid": booking_uid,"status":"rejected", "link" : link},
 		)
-		await mail.send_message(message, template_name="cancel_reject.html")
 
 		return reject_booking
 
@@ -150,13 +226,12 @@ async def cancel_or_reject_booking(booking_uid:str, user: User = Depends(get_cur
 		names = booking.firstName + " " + booking.lastName
 		booking_uid = booking.uid
 		link = ""
-		message = create_message(
+		await enqueue_mail(
 			recipients=[email],
 			subject="Booking cancelled",
 			template_name="cancel_reject.html",
 			context={"names": names, "booking_uid": booking_uid,"status":"cancelled", "link" : link},
 		)
-		await mail.send_message(message, template_name="cancel_reject.html")
 				
 		return cancel_booking
 		
@@ -183,60 +258,69 @@ async def delete_booking(booking_uid:str, user: User = Depends(get_current_user)
 
 		
 
+@booking_router.get("/dashboard/summary")
+async def get_dashboard_summary(windows: List[int] = Query(default=[7, 30, 90]), session: AsyncSession = Depends(get_read_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(admin_role_checker)):
+	windows = check_dashboard_windows(windows)
+	return await booking_service.get_dashboard_summary(date.today(), windows, session)
+
+
 @booking_router.get("/dashboard/new-bookings")
-async def get_new_bookings(session:AsyncSession = Depends(get_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(admin_role_checker)):
-	now = datetime.utcnow()
-	past_7_days = now - timedelta(days=7)
-	prev_7_days = past_7_days - timedelta(days=7)
-	return await booking_service.get_new_booking_count(now, past_7_days, prev_7_days, session)
+async def get_new_bookings(windows: List[int] = Query(default=[7]), session:AsyncSession = Depends(get_read_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(admin_role_checker)):
+	windows = check_dashboard_windows(windows)
+	return await booking_service.get_new_booking_count(date.today(), windows, session)
 
 
 @booking_router.get("/dashboard/total-revenue")
-async def get_total_revenue(session: AsyncSession = Depends(get_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(admin_role_checker)):
-    now = datetime.utcnow()
-    past_7_days = now - timedelta(days=7)
-    prev_7_days = past_7_days - timedelta(days=7)
-    return await booking_service.get_total_revenue(now, past_7_days, prev_7_days, session)
+async def get_total_revenue(windows: List[int] = Query(default=[7]), session: AsyncSession = Depends(get_read_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(admin_role_checker)):
+    windows = check_dashboard_windows(windows)
+    return await booking_service.get_total_revenue(date.today(), windows, session)
 
 
 @booking_router.get("/dashboard/pending-bookings")
-async def get_total_pending_bookings(session: AsyncSession = Depends(get_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(admin_role_checker)):
-    now = datetime.utcnow()
-    past_7_days = now - timedelta(days=7)
-    prev_7_days = past_7_days - timedelta(days=7)
-    return await booking_service.get_total_pending_bookings_count(now, past_7_days, prev_7_days, session)
+async def get_total_pending_bookings(windows: List[int] = Query(default=[7]), session: AsyncSession = Depends(get_read_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(admin_role_checker)):
+    windows = check_dashboard_windows(windows)
+    return await booking_service.get_total_pending_bookings_count(date.today(), windows, session)
 
 
 @booking_router.get("/dashboard/booking-statistics") 
-async def get_admin_booking_statistics(session: AsyncSession = Depends(get_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(admin_role_checker))-> dict:
-    return await booking_service.get_monthly_booking_counts(session)
+async def get_admin_booking_statistics(start: Optional[date] = None, end: Optional[date] = None, granularity: Literal["day", "week", "month"] = "month", session: AsyncSession = Depends(get_read_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(admin_role_checker))-> dict:
+    start, end = check_chart_period(start, end, granularity)
+    return await booking_service.get_monthly_booking_counts(start, end, granularity, session)
 
 
 @booking_router.get("/dashboard/revenue-statistics")
-async def get_admin_revenue_statistics(session: AsyncSession = Depends(get_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(admin_role_checker)):
-    return await booking_service.get_monthly_revenue(session)
+async def get_admin_revenue_statistics(start: Optional[date] = None, end: Optional[date] = None, granularity: Literal["day", "week", "month"] = "month", session: AsyncSession = Depends(get_read_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(admin_role_checker)):
+    start, end = check_chart_period(start, end, granularity)
+    return await booking_service.get_monthly_revenue(start, end, granularity, session)
 
 
 @booking_router.get("/dashboard/customer-bookings")
 async def get_customer_booking_statistics(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: Literal["day", "week", "month"] = "month",
     user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session)
+    session: AsyncSession = Depends(get_read_session)
 ):
-    return await booking_service.get_customer_bookings(user.uid, session)
+    start, end = check_chart_period(start, end, granularity)
+    return await booking_service.get_customer_bookings(user.uid, start, end, granularity, session)
 
 
 @booking_router.get("/dashboard/new-customers")
-async def get_new_customers(session: AsyncSession = Depends(get_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(admin_role_checker)):
+async def get_new_customers(start: Optional[date] = None, end: Optional[date] = None, approximate: bool = False, session: AsyncSession = Depends(get_read_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(admin_role_checker)):
     
-	today = datetime.today()
-	first_day = today.replace(day=1)
+	# Defaults to the customers of the current month
+	start = start or date.today().replace(day=1)
+
+	if end and end <= start:
+		raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="end must be after start")
 
-	return await booking_service.get_new_customers(first_day,session)
+	return await booking_service.get_new_customers(start, end, approximate, session)
     
 
 @booking_router.get("/dashboard/avg-daily-bookings")
-async def get_avg_daily_bookings(session: AsyncSession = Depends(get_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(admin_role_checker)):
-	today = datetime.today()
+async def get_avg_daily_bookings(session: AsyncSession = Depends(get_read_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(admin_role_checker)):
+	today = date.today()
 	first_day = today.replace(day=1)
 	days_so_far = today.day  
 
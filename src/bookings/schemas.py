@@ -1,8 +1,27 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, BeforeValidator, Field
 import uuid
 from datetime import datetime,date
-from typing import Optional, List
+from decimal import Decimal
+from typing import Annotated, Optional, List
 
+from src.invoice.schemas import InvoiceModel
+
+
+MOVING_DATE_FORMAT = "%Y-%m-%d %H:%M"
+
+
+def parse_moving_date(value):
+	""" Parses the booking form's "YYYY-MM-DD HH:MM"; anything else gets pydantic's datetime parsing """
+	if isinstance(value, str):
+		try:
+			return datetime.strptime(value, MOVING_DATE_FORMAT)
+		except ValueError:
+			pass
+
+	return value
+
+
+MovingDate = Annotated[datetime, BeforeValidator(parse_moving_date)]
 
 
 class Bookings(BaseModel):
@@ -19,7 +38,7 @@ class Bookings(BaseModel):
 	sub_services: Optional[List[str]]	= None
 	description : str
 	status : str
-	agreedPrice: str
+	agreedPrice: Optional[Decimal]
 	user_uid : Optional[uuid.UUID]
 	updated_at : datetime
 	created_at : datetime
@@ -33,7 +52,7 @@ class CreateBooking(BaseModel):
 	pickup_address : Optional[str] = None
 	dropoff_address : Optional[str] = None
 	location : Optional[str] = None
-	moving_date: str
+	moving_date: MovingDate
 	service : str
 	user_uid : Optional[uuid.UUID] = None
 	sub_services: Optional[List[str]]	= None
@@ -54,11 +73,28 @@ class UpdateBooking(BaseModel):
 
 
 class RescheduleBooking(BaseModel):
-	moving_date: str
+	moving_date: MovingDate
 
 
 class UpdateBookingStatus(BaseModel):
 	status: str
 
 class AddPayment(BaseModel):
-	agreedPrice: str
+	agreedPrice: Decimal = Field(ge=0, max_digits=12, decimal_places=2)
+
+class BookingPage(BaseModel):
+	bookings : List[Bookings]
+	next_cursor : Optional[str] = None
+
+class BookingWithInvoices(Bookings):
+	invoices : Optional[List[InvoiceModel]] = None
+
+
+class UserBookingPage(BaseModel):
+	bookings : List[BookingWithInvoices]
+	next_cursor : Optional[str] = None
+
+
+class BookingSearchPage(BaseModel):
+	bookings : List[Bookings]
+	next_offset : Optional[int] = None
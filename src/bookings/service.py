@@ -1,58 +1,173 @@
+import uuid
 from uuid import UUID
 from sqlmodel.ext.asyncio.session import AsyncSession
 from .schemas import CreateBooking,UpdateBooking,RescheduleBooking,UpdateBookingStatus,AddPayment
 from sqlmodel import select,desc
-from sqlalchemy import func,cast,Numeric,extract
-from .models import Bookings
-from datetime import datetime
+from sqlalchemy import func,cast,exists,insert,literal,literal_column,or_,tuple_,update
+from sqlalchemy.orm import aliased, selectinload
+from sqlalchemy.dialects.postgresql import TIMESTAMP
+from .models import Bookings, BookingDailyStats, BOOKING_SEARCH_TEXT, BOOKING_SEARCH_VECTOR
+from .stats import chart_series, hll_estimate, hll_register_and_rank, refresh_daily_stats, stats_key, stats_snapshot, sync_daily_stats, window_aggregates, window_values
+from datetime import date, datetime
+from typing import Optional
 
-from src.auth.services import UserService
-
-user_service = UserService()
+from src.auth.models import User
+from src.config import Config
+from src.db.cache import dashboard_cache, invalidate_on_commit
+from src.db.pagination import DEFAULT_PAGE_SIZE, LIKE_ESCAPE, encode_cursor, escape_like
 
 
 class BookingService:
-	async def create_new_booking(self,booking_data:CreateBooking, session: AsyncSession):
-		bookings_data_dict = booking_data.model_dump()
+	async def create_new_booking(self,booking_data:CreateBooking, session: AsyncSession, commit: bool = True):
+		""" Inserts the booking in one statement, linking it to the verified account with its email if there is one """
+		now = datetime.now()
+
+		# Going through the model applies its defaults before the values are inserted
+		booking_values = Bookings(**booking_data.model_dump()).model_dump()
+		booking_values.update(uid=uuid.uuid4(), status="Pending", created_at=now, updated_at=now)
+
+		if booking_values["user_uid"] is None:
+			booking_values["user_uid"] = select(User.uid).where(User.email == booking_values["email"], User.is_verified.is_(True)).scalar_subquery()
+
+		statement = insert(Bookings).values(**booking_values).returning(Bookings)
+
+		result = await session.execute(statement)
+		new_booking = result.scalar_one()
+
+		await refresh_daily_stats(session, [stats_key(new_booking)])
+
+		if commit:
+			await session.commit()
+
+		return new_booking
 
-		new_booking = Bookings(
-			**bookings_data_dict
+	async def get_all_bookings(self, session: AsyncSession, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[tuple[datetime, UUID]] = None, status: Optional[str] = None, service: Optional[str] = None, date_from: Optional[datetime] = None, date_to: Optional[datetime] = None):
+		""" Returns one page of bookings, newest first, plus the cursor of the next page """
+		filters = []
+
+		if status:
+			filters.append(Bookings.status == status)
+		if service:
+			filters.append(Bookings.service == service)
+		if date_from:
+			filters.append(Bookings.created_at >= date_from)
+		if date_to:
+			filters.append(Bookings.created_at < date_to)
+		if cursor:
+			filters.append(tuple_(Bookings.created_at, Bookings.uid) < tuple_(*cursor))
+
+		statement = (
+			select(Bookings)
+			.where(*filters)
+			.order_by(desc(Bookings.created_at), desc(Bookings.uid))
+			.limit(limit + 1)
 		)
 
-		new_booking.moving_date = datetime.strptime(bookings_data_dict['moving_date'],"%Y-%m-%d %H:%M")
-		new_booking.status = "Pending"
+		result = await session.exec(statement)
 
-		if new_booking.user_uid is None:
-			user = await user_service.get_user_by_email(new_booking.email,session)
-			if user:
-				new_booking.user_uid = user.uid
+		bookings = result.all()
 
+		next_cursor = None
+		if len(bookings) > limit:
+			bookings = bookings[:limit]
+			next_cursor = encode_cursor(bookings[-1].created_at, bookings[-1].uid)
 
-		session.add(new_booking)
+		return {"bookings": bookings, "next_cursor": next_cursor}
 
 
-		await session.commit()
+	async def search_bookings(self, query: str, session: AsyncSession, limit: int = DEFAULT_PAGE_SIZE, offset: int = 0, status: Optional[str] = None):
+		""" Returns one page of bookings matching ``query``, best match first.
 
-		return new_booking
+		Matches on the full-text search_vector, or on a substring of or fuzzy
+		word match against the contact details, all served by GIN indexes.
+		"""
+		search_query = func.websearch_to_tsquery(literal_column("'simple'::regconfig"), query).op("||")(
+			func.websearch_to_tsquery(literal_column("'english'::regconfig"), query)
+		)
+		search_text = query.lower()
+		pattern = "%" + escape_like(search_text) + "%"
+
+		filters = [
+			or_(
+				BOOKING_SEARCH_VECTOR.op("@@")(search_query),
+				BOOKING_SEARCH_TEXT.like(literal(pattern), escape=LIKE_ESCAPE),
+				literal(search_text).op("<%")(BOOKING_SEARCH_TEXT),
+			)
+		]
+
+		if status:
+			filters.append(Bookings.status == status)
 
-	async def get_all_bookings(self, session: AsyncSession):
-		statement = select(Bookings).order_by(desc(Bookings.created_at))
+		rank = func.ts_rank(BOOKING_SEARCH_VECTOR, search_query) + func.word_similarity(search_text, BOOKING_SEARCH_TEXT)
+
+		statement = (
+			select(Bookings)
+			.where(*filters)
+			.order_by(rank.desc(), desc(Bookings.created_at), desc(Bookings.uid))
+			.offset(offset)
+			.limit(limit + 1)
+		)
 
 		result = await session.exec(statement)
 
-		result = result.all()
+		bookings = result.all()
+
+		next_offset = None
+		if len(bookings) > limit:
+			bookings = bookings[:limit]
+			next_offset = offset + limit
 
-		return result
+		return {"bookings": bookings, "next_offset": next_offset}
 
 
-	async def get_user_bookings(self,user_uid : str, session: AsyncSession):
-		statement = select(Bookings).where(Bookings.user_uid == user_uid)
+	async def get_bookings(self, booking_uids: list[UUID], session: AsyncSession):
+		""" Loads many bookings in one query, keyed by uid """
+		statement = select(Bookings).where(Bookings.uid.in_(booking_uids))
 
 		result = await session.exec(statement)
 
-		result = result.all()
-		
-		return result
+		return {booking.uid: booking for booking in result.all()}
+
+
+	async def get_user_bookings(self,user_uid : str, session: AsyncSession, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[tuple[datetime, UUID]] = None, status: Optional[str] = None, include_invoices: bool = False):
+		""" Returns one page of a user's bookings, newest first, optionally with their invoices """
+		filters = [Bookings.user_uid == user_uid]
+
+		if status:
+			filters.append(Bookings.status == status)
+		if cursor:
+			filters.append(tuple_(Bookings.created_at, Bookings.uid) < tuple_(*cursor))
+
+		statement = (
+			select(Bookings)
+			.where(*filters)
+			.order_by(desc(Bookings.created_at), desc(Bookings.uid))
+			.limit(limit + 1)
+		)
+
+		if include_invoices:
+			# One extra IN query for the whole page instead of one per booking
+			statement = statement.options(selectinload(Bookings.invoices))
+
+		result = await session.exec(statement)
+
+		bookings = result.all()
+
+		next_cursor = None
+		if len(bookings) > limit:
+			bookings = bookings[:limit]
+			next_cursor = encode_cursor(bookings[-1].created_at, bookings[-1].uid)
+
+		# model_dump leaves relationships out, so invoices are added explicitly
+		if include_invoices:
+			bookings = [
+				{**booking.model_dump(), "invoices": [invoice.model_dump() for invoice in booking.invoices]}
+				for booking in bookings
+			]
+		else:
+			bookings = [booking.model_dump() for booking in bookings]
+
+		return {"bookings": bookings, "next_cursor": next_cursor}
 
 
 
@@ -67,21 +182,28 @@ class BookingService:
 		return result.first()
 
 
-	async def update_booking(self, booking_uid : str, update_data : UpdateBooking, session: AsyncSession):
+	async def update_booking(self, booking_uid : str, update_data : UpdateBooking, session: AsyncSession, commit: bool = True):
 		booking_to_update = await self.get_booking(booking_uid,session)
 
+		if booking_to_update is None:
+			return None
+
+		before = stats_snapshot(booking_to_update)
+
 		booking_update_dict = update_data.model_dump()
 
 		for k, v in booking_update_dict.items():
 			setattr(booking_to_update,k,v)
 
+		await sync_daily_stats(session, booking_to_update, before)
 
-		await session.commit()
+		if commit:
+			await session.commit()
 
 		return booking_to_update
 
 
-	async def reschedule_booking(self, booking_uid : str, reschedule_data:RescheduleBooking, session: AsyncSession):
+	async def reschedule_booking(self, booking_uid : str, reschedule_data:RescheduleBooking, session: AsyncSession, commit: bool = True):
 		booking_to_reschedule = await self.get_booking(booking_uid,session)
 
 		booking_reschedule_dict = reschedule_data.model_dump()
@@ -89,15 +211,14 @@ class BookingService:
 		for k, v in booking_reschedule_dict.items():
 			setattr(booking_to_reschedule,k,v)
 
-		booking_to_reschedule.moving_date = datetime.strptime(booking_reschedule_dict['moving_date'],"%Y-%m-%d %H:%M")
-
-		await session.commit()
+		if commit:
+			await session.commit()
 
 		return booking_to_reschedule
 
 
 
-	async def booking_status(self, booking_uid : str, booking_status_change_data:UpdateBookingStatus, session: AsyncSession):
+	async def booking_status(self, booking_uid : str, booking_status_change_data:UpdateBookingStatus, session: AsyncSession, commit: bool = True):
 		booking_status_change = await self.get_booking(booking_uid,session)
 
 
@@ -105,225 +226,332 @@ class BookingService:
 			return None
 
 
+		before = stats_snapshot(booking_status_change)
+
 		booking_status_change_dict = booking_status_change_data.model_dump()
 
 		for k, v in booking_status_change_dict.items():
 			setattr(booking_status_change,k,v)
 
-		await session.commit()
+		await sync_daily_stats(session, booking_status_change, before)
+
+		if commit:
+			await session.commit()
 
 		return booking_status_change
 
 
-	async def agreed_price(self, booking_uid : str, agreed_price_data:AddPayment, session: AsyncSession):
+	async def agreed_price(self, booking_uid : str, agreed_price_data:AddPayment, session: AsyncSession, commit: bool = True):
 		booking_to_charge = await self.get_booking(booking_uid,session)
 
+		if booking_to_charge is None:
+			return None
+
+		before = stats_snapshot(booking_to_charge)
+
 		booking_to_charge_dict = agreed_price_data.model_dump()
 
 		for k, v in booking_to_charge_dict.items():
 			setattr(booking_to_charge,k,v)
 
-		await session.commit()
+		await sync_daily_stats(session, booking_to_charge, before)
+
+		if commit:
+			await session.commit()
 
 		return booking_to_charge
 
 
 
-	async def cancel_booking(self, booking_uid : str, status:str, session: AsyncSession):
+	async def cancel_booking(self, booking_uid : str, status:str, session: AsyncSession, commit: bool = True):
 
 		booking_to_cancel = await self.get_booking(booking_uid,session)
 
-		booking_cancel_dict = booking_to_cancel.model_dump()
+		before = stats_snapshot(booking_to_cancel)
+
+		booking_to_cancel.status = status
 
-		booking_cancel_dict['status'] = status
-		await session.commit()
+		await sync_daily_stats(session, booking_to_cancel, before)
 
-		return booking_cancel_dict
+		if commit:
+			await session.commit()
+
+		return booking_to_cancel
 
 	
 
-	async def quick_update_booking(self, booking:Bookings, booking_data: dict, session: AsyncSession):
-		
+	async def quick_update_booking(self, booking:Bookings, booking_data: dict, session: AsyncSession, commit: bool = True):
+		before = stats_snapshot(booking)
+
 		for k, v in booking_data.items():
 			setattr(booking, k, v)
 
-		await session.commit()
+		await sync_daily_stats(session, booking, before)
+
+		if commit:
+			await session.commit()
 		return booking
 
-	async def link_booking_to_user(self, user_uid:UUID,user_email:str, session: AsyncSession):
-		statement = select(Bookings).where(Bookings.email == user_email)
+	async def link_booking_to_user(self, user_uid:UUID,user_email:str, session: AsyncSession, commit: bool = True):
+		""" Links the email's unlinked guest bookings to the user in one UPDATE; returns their uids """
+		statement = (
+			update(Bookings)
+			.where(Bookings.email == user_email, Bookings.user_uid.is_(None))
+			.values(user_uid=user_uid)
+			.returning(Bookings.uid)
+		)
 
-		result = await session.exec(statement)
-		bookings = result.all()  
+		result = await session.execute(statement)
+		linked = result.scalars().all()
 
-		if bookings:
-			for booking in bookings:
-				booking.user_uid = user_uid
+		if linked:
+			invalidate_on_commit(session)
 
+		if commit:
 			await session.commit()
-		return bookings
+		return linked
 
 
-	async def delete_booking(self, booking_uid: str, session: AsyncSession):
+	async def link_guest_bookings(self, session: AsyncSession, chunk_size: int, commit: bool = True):
+		""" Links up to ``chunk_size`` unlinked bookings to the verified accounts that share their email; returns how many """
+		# Like /auth/verify, only link once the account has proven it owns the email
+		candidates = (
+			select(Bookings.uid)
+			.join(User, User.email == Bookings.email)
+			.where(Bookings.user_uid.is_(None), User.is_verified.is_(True))
+			.limit(chunk_size)
+		)
+
+		statement = (
+			update(Bookings)
+			.where(Bookings.uid.in_(candidates.scalar_subquery()), Bookings.email == User.email, User.is_verified.is_(True))
+			.values(user_uid=User.uid)
+			.execution_options(synchronize_session=False)
+		)
+
+		result = await session.execute(statement)
+
+		if result.rowcount:
+			invalidate_on_commit(session)
+
+		if commit:
+			await session.commit()
+		return result.rowcount
+
+
+	async def delete_booking(self, booking_uid: str, session: AsyncSession, commit: bool = True):
 		booking_to_delete = await self.get_booking(booking_uid, session)
 		
 		await session.delete(booking_to_delete)
-		await session.commit()
+
+		await refresh_daily_stats(session, [stats_key(booking_to_delete)])
+		if commit:
+			await session.commit()
 		
 		return booking_to_delete
 
 
 
 
-	async def get_sum_or_count(session: AsyncSession, column, filter_status=None, past_7_days=None, prev_7_days=None):
+	async def get_sum_or_count(session: AsyncSession, column, filter_status=None, today=None, windows=(7,)):
 		"""
-		General function to get total sum or count, plus 7-day growth if needed.
+		General function to get the total of a booking_daily_stats column, plus the growth of each window, in one query.
 
 		:param session: Async database session
-		:param column: Column to aggregate (e.g., func.count() or func.sum(Bookings.price))
+		:param column: Rollup column to sum (e.g., BookingDailyStats.bookings or BookingDailyStats.revenue)
 		:param filter_status: Optional booking status filter (e.g., "completed")
-		:param past_7_days: Timestamp for last 7 days (optional)
-		:param prev_7_days: Timestamp for prior 7-day period (optional)
+		:param today: Day the windows end on (defaults to today)
+		:param windows: Window lengths in days, each compared with the same number of days before it (e.g., (7, 30, 90))
 		"""
-		filters = []
-		prev_filters = []
-
-		if filter_status:
-			filters.append(Bookings.status == filter_status)
-			prev_filters.append(Bookings.status == filter_status)
+		today = today or date.today()
+		condition = BookingDailyStats.status == filter_status if filter_status else None
 
-		statement = select(column).where(*filters)
+		statement = select(*window_aggregates("value", column, today, windows, condition))
 		result = await session.exec(statement)
-		total_value = result.first() or 0 		
-		if past_7_days and prev_7_days:
 
-			statement = select(column).where(Bookings.created_at >= past_7_days, *filters)
-			result = await session.exec(statement)
-			current_value = result.first() or 0	
+		return window_values(result.one(), "value", windows)
 
-			statement = select(column).where(
-                Bookings.created_at >= prev_7_days, 
-                Bookings.created_at < past_7_days, 
-                *prev_filters
-            )
-			result = await session.exec(statement)
-			previous_value = result.first() or 0			
 
-			growth = 100 if previous_value == 0 and current_value > 0 else (
-                ((current_value - previous_value) / previous_value) * 100 if previous_value > 0 else 0
-            )
+	@dashboard_cache.cached("new-bookings", Config.DASHBOARD_CACHE_TTL)
+	async def get_new_booking_count(self, today, windows, session: AsyncSession):
+		return await BookingService.get_sum_or_count(session, BookingDailyStats.bookings, today=today, windows=windows)
 
-			return {"total_value": round(total_value, 2),"previous_7_days": round(previous_value,2), "last_7_days": round(current_value, 2), "growth": round(growth, 2)}
-        
-		return {"total_value": round(total_value, 2)}
 
+	@dashboard_cache.cached("total-revenue", Config.DASHBOARD_CACHE_TTL)
+	async def get_total_revenue(self, today, windows, session: AsyncSession):
+		return await BookingService.get_sum_or_count(session, BookingDailyStats.revenue, filter_status="confirmed", today=today, windows=windows)
+	
+	
+	@dashboard_cache.cached("pending-bookings", Config.DASHBOARD_CACHE_TTL)
+	async def get_total_pending_bookings_count(self, today, windows, session: AsyncSession):
+		return await BookingService.get_sum_or_count(session, BookingDailyStats.bookings, filter_status="invoiced", today=today, windows=windows)
 
-	async def get_new_booking_count(self,now, past_7_days, prev_7_days, session: AsyncSession):
-		return await BookingService.get_sum_or_count(session, func.count(Bookings.uid), past_7_days=past_7_days, prev_7_days=prev_7_days)
 
+	@dashboard_cache.cached("summary", Config.DASHBOARD_CACHE_TTL)
+	async def get_dashboard_summary(self, today, windows, session: AsyncSession):
+		""" Every dashboard KPI; the booking and revenue figures come from a single rollup query """
+		first_day = today.replace(day=1)
 
-	async def get_total_revenue(self, now, past_7_days, prev_7_days, session: AsyncSession):
-		return await BookingService.get_sum_or_count(session, func.sum(cast(Bookings.agreedPrice, Numeric)), filter_status="confirmed", past_7_days=past_7_days, prev_7_days=prev_7_days)
-	
-	
-	async def get_total_pending_bookings_count(self, now, past_7_days, prev_7_days, session: AsyncSession):
-		return await BookingService.get_sum_or_count(session, func.count(Bookings.uid), filter_status="invoiced", past_7_days=past_7_days, prev_7_days=prev_7_days)
+		statement = select(
+			*window_aggregates("new_bookings", BookingDailyStats.bookings, today, windows),
+			*window_aggregates("total_revenue", BookingDailyStats.revenue, today, windows, BookingDailyStats.status == "confirmed"),
+			*window_aggregates("pending_bookings", BookingDailyStats.bookings, today, windows, BookingDailyStats.status == "invoiced"),
+			func.coalesce(func.sum(BookingDailyStats.bookings).filter(BookingDailyStats.day >= first_day), 0).label("month_bookings"),
+		)
+		result = await session.exec(statement)
+		row = result.one()
 
+		customers = await self.get_new_customers(first_day, None, False, session)
 
+		return {
+			"new_bookings": window_values(row, "new_bookings", windows),
+			"total_revenue": window_values(row, "total_revenue", windows),
+			"pending_bookings": window_values(row, "pending_bookings", windows),
+			"avg_daily_bookings": round(row.month_bookings / today.day, 2),
+			"customers": customers,
+		}
 
-	async def get_monthly_booking_counts(self,session: AsyncSession):
 
-		current_year = datetime.utcnow().year
+
+	@dashboard_cache.cached("booking-statistics", Config.DASHBOARD_STATS_CACHE_TTL)
+	async def get_monthly_booking_counts(self, start: date, end: date, granularity: str, session: AsyncSession):
+		""" Fetches the number of bookings created in [start, end) per day, week or month """
+		period = func.date_trunc(granularity, cast(BookingDailyStats.day, TIMESTAMP)).label('period')
 
 		statement = (
 			select(
-				extract('month', Bookings.created_at).label('month'),
-				func.count().label('count')
+				period,
+				func.sum(BookingDailyStats.bookings).label('count')
 			)
-			.where(func.extract('year', Bookings.created_at) == current_year)
-			.group_by('month')
-			.order_by('month')
+			.where(
+				BookingDailyStats.day >= start,
+				BookingDailyStats.day < end
+			)
+			.group_by('period')
+			.order_by('period')
 		)
 
 		result = await session.exec(statement)
-		data = result.all()
-
-		bookings_per_month = {int(row.month): row.count for row in data}
-
-		monthly_stats = [{"month": month, "count": bookings_per_month.get(month, 0)} for month in range(1, 13)]
 
-		return {"data": monthly_stats}
+		return {"data": chart_series(result.all(), "count", start, end, granularity)}
 
 
 
-	async def get_monthly_revenue(self,session: AsyncSession):
-		""" Fetches the total revenue for each month of the current year """
-		current_year = datetime.utcnow().year
+	@dashboard_cache.cached("revenue-statistics", Config.DASHBOARD_STATS_CACHE_TTL)
+	async def get_monthly_revenue(self, start: date, end: date, granularity: str, session: AsyncSession):
+		""" Fetches the confirmed revenue of bookings created in [start, end) per day, week or month """
+		period = func.date_trunc(granularity, cast(BookingDailyStats.day, TIMESTAMP)).label('period')
 
 		statement = (
 			select(
-				extract('month', Bookings.created_at).label('month'),
-				func.sum(cast(Bookings.agreedPrice, Numeric)).label('revenue')
+				period,
+				func.sum(BookingDailyStats.revenue).label('revenue')
 			)
 			.where(
-				func.extract('year', Bookings.created_at) == current_year,
-				Bookings.status == "confirmed"  # Only consider completed bookings
+				BookingDailyStats.day >= start,
+				BookingDailyStats.day < end,
+				BookingDailyStats.status == "confirmed"  # Only consider completed bookings
 			)
-			.group_by('month')
-			.order_by('month')
+			.group_by('period')
+			.order_by('period')
 		)
 
 		result = await session.exec(statement)
-		data = result.all()
 
-		revenue_per_month = {int(row.month): row.revenue for row in data}
+		return {"data": chart_series(result.all(), "revenue", start, end, granularity)}
 
-		monthly_revenue_stats = [{"month": month, "revenue": revenue_per_month.get(month, 0)} for month in range(1, 13)]
 
-		return {"data": monthly_revenue_stats}
-
-
-	async def get_customer_bookings(self,customer_id: int, session: AsyncSession):
-		""" Fetches the number of bookings for each month for a specific customer """
-		current_year = datetime.utcnow().year
+	@dashboard_cache.cached("customer-bookings", Config.DASHBOARD_STATS_CACHE_TTL)
+	async def get_customer_bookings(self, customer_id: UUID, start: date, end: date, granularity: str, session: AsyncSession):
+		""" Fetches the number of bookings a customer made in [start, end) per day, week or month """
+		period = func.date_trunc(granularity, Bookings.created_at).label('period')
 
 		statement = (
 			select(
-				extract('month', Bookings.created_at).label('month'),
-				func.count().label('total_bookings')
+				period,
+				func.count().label('bookings')
 			)
 			.where(
-				func.extract('year', Bookings.created_at) == current_year,
-				Bookings.user_uid == customer_id  # Filter bookings by customer ID
+				Bookings.user_uid == customer_id,  # Filter bookings by customer ID
+				Bookings.created_at >= start,
+				Bookings.created_at < end
 			)
-			.group_by('month')
-			.order_by('month')
+			.group_by('period')
+			.order_by('period')
 		)
 
 		result = await session.exec(statement)
-		data = result.all()
 
-		# Convert to dictionary format {1: count, 2: count, ..., 12: count}
-		bookings_per_month = {int(row.month): row.total_bookings for row in data}
+		return {"data": chart_series(result.all(), "bookings", start, end, granularity)}
+
 
-		# Ensure all 12 months are represented
-		customer_booking_stats = [{"month": month, "bookings": bookings_per_month.get(month, 0)} for month in range(1, 13)]
+	@dashboard_cache.cached("new-customers", Config.DASHBOARD_CACHE_TTL)
+	async def get_new_customers(self, start: date, end: Optional[date], approximate: bool, session: AsyncSession):
+		""" Counts the customers who booked in [start, end), split into first-time and returning ones.
 
-		return {"data": customer_booking_stats}
+		The approximate mode returns a HyperLogLog estimate of the customers,
+		reading at most HLL_REGISTERS rows however many bookings the range holds.
+		It leaves the new and returning counts as None, since estimating them
+		takes the difference of sketches over the whole history, whose error
+		can exceed the counts themselves.
+		"""
+		if approximate:
+			return await self.estimate_new_customers(start, end, session)
 
+		window_filters = [Bookings.created_at >= start]
+		if end:
+			window_filters.append(Bookings.created_at < end)
 
-	async def get_new_customers(self,first_day: int, session: AsyncSession):
-		# Query unique customers who made bookings this month
-		statement = select(Bookings.email).where(Bookings.created_at >= first_day).distinct()
-		results = await session.exec(statement)
-		results = results.all()
-		
-		return {"new_customers": len(results)}
+		customers = select(Bookings.email).where(*window_filters).distinct().subquery()
+
+		earlier_booking = aliased(Bookings)
+		has_history = exists().where(earlier_booking.email == customers.c.email, earlier_booking.created_at < start)
+
+		statement = select(
+			func.count().label("customers"),
+			func.count().filter(~has_history).label("new_customers"),
+		).select_from(customers)
+
+		result = await session.exec(statement)
+		row = result.one()
+
+		return {
+			"customers": row.customers,
+			"new_customers": row.new_customers,
+			"returning_customers": row.customers - row.new_customers,
+			"approximate": False,
+		}
+
+
+	async def estimate_new_customers(self, start: date, end: Optional[date], session: AsyncSession):
+		""" Estimates the distinct customers who booked in [start, end) from a sketch of that range only """
+		register, rank = hll_register_and_rank(Bookings.email)
+
+		filters = [Bookings.created_at >= start]
+		if end:
+			filters.append(Bookings.created_at < end)
+
+		statement = (
+			select(register.label("register"), func.max(rank).label("rank"))
+			.where(*filters)
+			.group_by("register")
+		)
+
+		result = await session.exec(statement)
+		rows = result.all()
+
+		return {
+			"customers": round(hll_estimate(row.rank for row in rows)),
+			"new_customers": None,
+			"returning_customers": None,
+			"approximate": True,
+		}
 
 
-	async def get_avg_daily_bookings(self, first_day:datetime , days_so_far:int, session:AsyncSession):
+	@dashboard_cache.cached("avg-daily-bookings", Config.DASHBOARD_CACHE_TTL)
+	async def get_avg_daily_bookings(self, first_day:date , days_so_far:int, session:AsyncSession):
 	# Count total bookings in the current month
-		stmt = select(func.count()).where(Bookings.created_at >= first_day)
+		stmt = select(func.sum(BookingDailyStats.bookings)).where(BookingDailyStats.day >= first_day)
 		result = await session.exec(stmt)
 		total_bookings = result.first()  # Handle case where no bookings exist
 
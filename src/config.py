@@ -1,10 +1,25 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    READ_DATABASE_URL : Optional[str] = None
+    READ_YOUR_WRITES_SECONDS : int = 5
+    DB_ECHO : bool = False
+    DB_POOL_SIZE : int = 5
+    DB_MAX_OVERFLOW : int = 10
+    DB_POOL_TIMEOUT : int = 30
+    DB_POOL_PRE_PING : bool = True
+    DB_POOL_RECYCLE : int = 1800
+    DB_STATEMENT_CACHE_SIZE : int = 100
     JWT_SECRET: str
     JWT_ALGORITHM: str
+    BCRYPT_ROUNDS : int = 12
+    PASSWORD_HASH_WORKERS : int = 4
+    AUTH_CACHE_TTL : int = 30
+    AUTH_CACHE_SIZE : int = 10000
     REDIS_HOST : str = "localhost"
     REDIS_PORT : int = "6379"
     REDIS_URL : str = f"redis://{REDIS_HOST}:{REDIS_PORT}"
@@ -18,9 +33,26 @@ class Settings(BaseSettings):
     MAIL_SSL_TLS : bool = False
     USE_CREDENTIALS : bool = True
     VALIDATE_CERTS : bool = True
+    MAIL_QUEUE_BACKEND : str = "redis"
+    MAIL_WORKER_CONNECTIONS : int = 2
+    MAIL_BATCH_SIZE : int = 20
+    MAIL_MAX_ATTEMPTS : int = 5
+    MAIL_RETRY_BACKOFF : int = 5
     DOMAIN : str
     STRIPE_SECRET_KEY : str
     STRIPE_WEBHOOK_SECRET : str
+    STRIPE_API_BASE : Optional[str] = None
+    STRIPE_TIMEOUT : float = 10
+    STRIPE_MAX_NETWORK_RETRIES : int = 2
+    STRIPE_CUSTOMER_CACHE_SIZE : int = 10000
+    STRIPE_BULK_CONCURRENCY : int = 8
+    STRIPE_EVENT_BATCH_SIZE : int = 50
+    STRIPE_EVENT_POLL_INTERVAL : float = 1
+    STRIPE_EVENT_MAX_ATTEMPTS : int = 5
+    STRIPE_EVENT_MISSING_INVOICE_TIMEOUT : int = 300
+    DASHBOARD_CACHE_TTL : int = 30
+    DASHBOARD_STATS_CACHE_TTL : int = 300
+    DASHBOARD_CACHE_LOCAL_SIZE : int = 1000
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 
@@ -0,0 +1,214 @@
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+import redis.asyncio as aioredis
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.config import Config
+from src.db.main import SessionLocal
+from src.db.redis import token_blocklist
+
+# session.info flag set by writes that change what the cached results are computed from
+INVALIDATE_FLAG = "invalidate_result_cache"
+
+
+class LRUCache:
+    """Bounded in-process cache that evicts the least recently used entry.
+
+    Entries expire after ``ttl`` seconds, or after the ttl passed to ``set``;
+    with neither they are kept until evicted.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[Any, tuple[float | None, Any]] = OrderedDict()
+
+    def get(self, key: Any) -> Any:
+        entry = self._entries.get(key)
+
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Any, value: Any, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+
+        self._entries[key] = (None if ttl is None else time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Any) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class ResultCache:
+    """Caches JSON-ready results in Redis, or in this process while Redis is unreachable.
+
+    Keys embed a version number, so ``invalidate()`` drops every entry at once by
+    bumping it. Concurrent misses for one key within a worker share one computation.
+    Methods wrapped by ``cached`` compute in a session from ``session_factory``.
+    """
+
+    def __init__(self, namespace: str, redis: aioredis.Redis, local_maxsize: int, session_factory: Callable[[], AsyncSession]) -> None:
+        self.namespace = namespace
+        self.redis = redis
+        self.session_factory = session_factory
+        self.version_key = f"{namespace}:version"
+        self.local_version = 0
+        self._local = LRUCache(local_maxsize)
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def version(self) -> tuple[bool, str]:
+        """Returns whether to use the local fallback, and the current version."""
+        try:
+            version = await self.redis.get(self.version_key)
+            return False, f"r{int(version or 0)}"
+        except (aioredis.RedisError, OSError) as e:
+            logging.warning(f"Result cache falling back to local memory: {e}")
+            return True, f"l{self.local_version}"
+
+    async def load(self, key: str, local: bool) -> Any:
+        if local:
+            return self._local.get(key)
+
+        try:
+            value = await self.redis.get(key)
+        except (aioredis.RedisError, OSError) as e:
+            logging.warning(str(e))
+            return None
+
+        return None if value is None else json.loads(value)
+
+    async def store(self, key: str, value: Any, ttl: int, local: bool) -> None:
+        if local:
+            self._local.set(key, value, ttl)
+            return
+
+        try:
+            await self.redis.set(key, json.dumps(value), ex=ttl)
+        except (aioredis.RedisError, OSError) as e:
+            logging.warning(str(e))
+
+    async def get_or_compute(self, name: str, params: str, ttl: int, compute: Callable[[], Awaitable[Any]]) -> Any:
+        local, version = await self.version()
+        key = f"{self.namespace}:{version}:{name}:{params}"
+
+        value = await self.load(key, local)
+
+        if value is not None:
+            return value
+
+        future = self._inflight.get(key)
+
+        if future is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Only take over when the computing request went away, not this one
+                if not future.cancelled():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+
+        try:
+            value = jsonable_encoder(await compute())
+            await self.store(key, value, ttl, local)
+            future.set_result(value)
+            return value
+
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Waiters re-raise it; nothing else has to retrieve it
+                future.exception()
+            raise
+
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def invalidate(self) -> None:
+        self.local_version += 1
+        self._local.clear()
+
+        try:
+            await self.redis.incr(self.version_key)
+        except (aioredis.RedisError, OSError) as e:
+            logging.warning(str(e))
+
+    def cached(self, name: str, ttl: int):
+        """Caches an async service method by its arguments, ignoring ``self`` and the session.
+
+        On a miss the method runs in a session from ``session_factory`` in place
+        of the caller's. A replica session could still predate the write that
+        invalidated the cache and would store the stale result for ``ttl``.
+        """
+        def decorator(method):
+            @functools.wraps(method)
+            async def wrapper(*args, **kwargs):
+                params = [repr(arg) for arg in args[1:] if not isinstance(arg, AsyncSession)]
+                params += [f"{k}={v!r}" for k, v in sorted(kwargs.items()) if not isinstance(v, AsyncSession)]
+                digest = hashlib.sha1(",".join(params).encode()).hexdigest()
+
+                async def compute():
+                    async with self.session_factory() as session:
+                        return await method(
+                            *[session if isinstance(arg, AsyncSession) else arg for arg in args],
+                            **{k: session if isinstance(v, AsyncSession) else v for k, v in kwargs.items()},
+                        )
+
+                return await self.get_or_compute(name, digest, ttl, compute)
+
+            return wrapper
+
+        return decorator
+
+
+dashboard_cache = ResultCache("dashboard", token_blocklist, Config.DASHBOARD_CACHE_LOCAL_SIZE, SessionLocal)
+
+# Keeps the invalidations scheduled after commit referenced until they finish
+_pending_invalidations: set[asyncio.Task] = set()
+
+
+def invalidate_on_commit(session: AsyncSession) -> None:
+    """Drops the dashboard cache once the session's transaction commits."""
+    session.info[INVALIDATE_FLAG] = True
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_after_commit(session: Session) -> None:
+    if session.info.pop(INVALIDATE_FLAG, False):
+        task = asyncio.get_running_loop().create_task(dashboard_cache.invalidate())
+        _pending_invalidations.add(task)
+        task.add_done_callback(_pending_invalidations.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_invalidation(session: Session) -> None:
+    session.info.pop(INVALIDATE_FLAG, None)
@@ -1,29 +1,146 @@
-from sqlmodel import SQLModel, create_engine
+import logging
+import uuid
+from contextlib import asynccontextmanager
+
+import redis.asyncio as aioredis
+from fastapi import Request
+from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
 
 
+from src.auth.utils import decode_token
 from src.config import Config
+from src.db.redis import token_blocklist
+
+
+def build_engine(url: str) -> AsyncEngine:
+	connect_args = {}
+
+	if url.startswith("postgresql+asyncpg"):
+		connect_args["statement_cache_size"] = Config.DB_STATEMENT_CACHE_SIZE
+
+	return create_async_engine(
+		url,
+		echo=Config.DB_ECHO,
+		pool_size=Config.DB_POOL_SIZE,
+		max_overflow=Config.DB_MAX_OVERFLOW,
+		pool_timeout=Config.DB_POOL_TIMEOUT,
+		pool_pre_ping=Config.DB_POOL_PRE_PING,
+		pool_recycle=Config.DB_POOL_RECYCLE,
+		connect_args=connect_args,
+	)
+
+
+engine = build_engine(Config.DATABASE_URL)
+
+# Falls back to the primary when no replica is configured
+read_engine = build_engine(Config.READ_DATABASE_URL) if Config.READ_DATABASE_URL else engine
+
+SessionLocal = async_sessionmaker(
+	bind=engine, class_=AsyncSession, expire_on_commit=False
+)
+
+ReadSessionLocal = async_sessionmaker(
+	bind=read_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+
+# Identifies anonymous clients, so their reads can follow their own writes too
+RECENT_WRITE_COOKIE = "rw_client"
+
+
+def client_key(request: Request) -> str | None:
+	""" The signed-in user, or the anonymous client's cookie; None for an anonymous client without one """
+	scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+
+	if scheme.lower() == "bearer" and token:
+		token_data = decode_token(token)
+
+		if token_data and token_data.get("user", {}).get("user_uid"):
+			return f"user:{token_data['user']['user_uid']}"
+
+	client_id = request.cookies.get(RECENT_WRITE_COOKIE)
+
+	return f"client:{client_id}" if client_id else None
+
 
+async def has_recent_write(request: Request) -> bool:
+	key = client_key(request)
+
+	if key is None:
+		return False
+
+	try:
+		return bool(await token_blocklist.exists(f"recent_write:{key}"))
+	except (aioredis.RedisError, OSError) as e:
+		logging.warning(str(e))
+		# The primary is never behind
+		return True
+
+
+async def track_recent_writes(request: Request, call_next):
+	""" Marks clients that committed on the primary, in Redis so every worker sees it """
+	response = await call_next(request)
+
+	if read_engine is engine or not getattr(request.state, "wrote", False):
+		return response
+
+	key = client_key(request)
+
+	if key is None:
+		client_id = uuid.uuid4().hex
+		key = f"client:{client_id}"
+		response.set_cookie(RECENT_WRITE_COOKIE, client_id, httponly=True, samesite="lax")
+
+	try:
+		await token_blocklist.set(f"recent_write:{key}", 1, ex=Config.READ_YOUR_WRITES_SECONDS)
+	except (aioredis.RedisError, OSError) as e:
+		logging.warning(str(e))
+
+	return response
+
+
+@event.listens_for(Session, "after_commit")
+def remember_write(session: Session) -> None:
+	state = session.info.get("request_state")
+
+	if state is not None:
+		state.wrote = True
+
+
+@asynccontextmanager
+async def unit_of_work(session: AsyncSession):
+	""" Commits everything staged with commit=False once on exit, or rolls it all back """
+	try:
+		yield session
+		await session.commit()
+	except Exception:
+		await session.rollback()
+		raise
 
-engine = AsyncEngine(
-	create_engine(
-	url=Config.DATABASE_URL,
-	echo=True
-))
 
 async def init_db() -> None:
-    async with async_engine.begin() as conn:
+    async with engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
 		
 
 
 
-async def get_session() -> AsyncSession:
-	Session = sessionmaker(
-		bind=engine, class_=AsyncSession, expire_on_commit=False
-	)
+async def get_session(request: Request) -> AsyncSession:
+	async with SessionLocal() as session:
+		session.info["request_state"] = request.state
+		yield session
+
+
+async def get_read_session(request: Request) -> AsyncSession:
+	""" Session on the read replica, or on the primary shortly after this client wrote """
+	if read_engine is engine or await has_recent_write(request):
+		factory = SessionLocal
+	else:
+		factory = ReadSessionLocal
 
-	async with Session() as session:
+	async with factory() as session:
 		yield session
@@ -0,0 +1,48 @@
+import base64
+import json
+import logging
+import uuid
+from datetime import datetime
+
+MAX_PAGE_SIZE = 100
+DEFAULT_PAGE_SIZE = 20
+
+LIKE_ESCAPE = "\\"
+
+
+def encode_cursor(created_at: datetime, uid: uuid.UUID) -> str:
+    payload = json.dumps({"created_at": created_at.isoformat(), "uid": str(uid)})
+
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID] | None:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+
+        return datetime.fromisoformat(payload["created_at"]), uuid.UUID(payload["uid"])
+
+    except Exception as e:
+        logging.error(str(e))
+        return None
+
+
+def escape_like(text: str) -> str:
+    """Escapes LIKE wildcards so ``text`` matches literally when compared with ``escape=LIKE_ESCAPE``."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def encode_uid_cursor(uid: uuid.UUID) -> str:
+    return base64.urlsafe_b64encode(uid.bytes).decode().rstrip("=")
+
+
+def decode_uid_cursor(cursor: str) -> uuid.UUID | None:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+
+        return uuid.UUID(bytes=base64.urlsafe_b64decode(padded.encode()))
+
+    except Exception as e:
+        logging.error(str(e))
+        return None
@@ -1,16 +1,141 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+
 import redis.asyncio as aioredis
 
 from src.config import Config
 
 JTI_EXPIRY = 3600
+JTI_STREAM = "jti_blocklist:stream"
+# Epoch time from which a filter miss can be trusted, shared by every worker
+JTI_FILTER_TRUSTED_KEY = "jti_blocklist:filter_trusted_at"
+JTI_SYNC_BATCH = 1000
+JTI_FILTER_CAPACITY = 100000
+JTI_FILTER_ERROR_RATE = 0.001
 
 token_blocklist = aioredis.from_url(Config.REDIS_URL)
 
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.size = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevokedJtiFilter:
+    """Local mirror of the revoked JTIs, used to skip the Redis lookup.
+
+    Bloom filters cannot delete, so entries expire by generation: every
+    JTI_EXPIRY seconds the current filter becomes the previous one and the
+    old previous one is dropped. A JTI therefore stays visible for between
+    one and two JTI_EXPIRY periods, never less than its Redis key.
+
+    JTIs revoked before the stream was in use exist only as Redis keys, so
+    misses are only trusted from ``trusted_at``, when the last of those keys
+    has expired.
+    """
+
+    def __init__(self) -> None:
+        self.trusted_at = math.inf
+        self.reset()
+
+    def reset(self) -> None:
+        self.current = BloomFilter(JTI_FILTER_CAPACITY, JTI_FILTER_ERROR_RATE)
+        self.previous = BloomFilter(JTI_FILTER_CAPACITY, JTI_FILTER_ERROR_RATE)
+        self.rotated_at = time.monotonic()
+        self.synced = False
+
+    def _rotate(self) -> None:
+        if time.monotonic() - self.rotated_at >= JTI_EXPIRY:
+            self.previous = self.current
+            self.current = BloomFilter(JTI_FILTER_CAPACITY, JTI_FILTER_ERROR_RATE)
+            self.rotated_at = time.monotonic()
+
+    def add(self, jti: str) -> None:
+        self._rotate()
+        self.current.add(jti)
+
+    def might_contain(self, jti: str) -> bool:
+        self._rotate()
+        return jti in self.current or jti in self.previous
+
+    def authoritative(self) -> bool:
+        return self.synced and time.time() >= self.trusted_at
+
+
+revoked_jtis = RevokedJtiFilter()
+
+
 async def add_jti_to_blocklist(jti: str) -> None:
-    await token_blocklist.set(name=jti, value="", ex=JTI_EXPIRY)
+    oldest_id = int((time.time() - JTI_EXPIRY) * 1000)
+
+    async with token_blocklist.pipeline(transaction=False) as pipe:
+        pipe.set(name=jti, value="", ex=JTI_EXPIRY)
+        pipe.xadd(JTI_STREAM, {"jti": jti}, minid=oldest_id, approximate=True)
+        await pipe.execute()
+
+    revoked_jtis.add(jti)
 
 
 async def token_in_blocklist(jti: str) -> bool:
+    # A filter miss is definitive, only possible hits need the round trip
+    if revoked_jtis.authoritative() and not revoked_jtis.might_contain(jti):
+        return False
+
     jti = await token_blocklist.get(jti)
 
-    return jti is not None
\ No newline at end of file
+    return jti is not None
+
+
+async def sync_revoked_jtis() -> None:
+    """Loads the last JTI_EXPIRY seconds of revocations, then follows the stream."""
+    while True:
+        revoked_jtis.reset()
+        last_id = f"{int((time.time() - JTI_EXPIRY) * 1000)}-0"
+
+        try:
+            # The first worker to sync fixes the moment for everyone; the revocations
+            # made before it, by code that did not write the stream, expire by then
+            await token_blocklist.set(JTI_FILTER_TRUSTED_KEY, time.time() + JTI_EXPIRY, nx=True)
+            revoked_jtis.trusted_at = float(await token_blocklist.get(JTI_FILTER_TRUSTED_KEY))
+
+            while True:
+                response = await token_blocklist.xread(
+                    {JTI_STREAM: last_id},
+                    count=JTI_SYNC_BATCH,
+                    block=5000 if revoked_jtis.synced else None,
+                )
+                entries = response[0][1] if response else []
+
+                for entry_id, fields in entries:
+                    revoked_jtis.add(fields[b"jti"].decode())
+                    last_id = entry_id
+
+                if not revoked_jtis.synced and len(entries) < JTI_SYNC_BATCH:
+                    revoked_jtis.synced = True
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as e:
+            logging.error(str(e))
+            revoked_jtis.synced = False
+            await asyncio.sleep(1)
@@ -1,8 +1,14 @@
-from sqlmodel import SQLModel,Field,Column
+from sqlmodel import SQLModel,Field,Column,Relationship
 import sqlalchemy.dialects.postgresql as pg
+from sqlalchemy import Index, text
 from datetime import datetime
+from decimal import Decimal
+from typing import Optional, TYPE_CHECKING
 import uuid
 
+if TYPE_CHECKING:
+	from src.bookings.models import Bookings
+
 
 class Invoice(SQLModel, table=True):
 	__tablename__ = "invoices"
@@ -15,13 +21,48 @@ class Invoice(SQLModel, table=True):
 			default=uuid.uuid4
 		)
 	)
-	booking_uid : uuid.UUID = Field(foreign_key="bookings.uid",nullable=False)
-	stripe_invoice_id : str
-	amount : float
+	booking_uid : uuid.UUID = Field(foreign_key="bookings.uid",nullable=False, index=True)
+	stripe_invoice_id : str = Field(unique=True, index=True)
+	amount : Decimal = Field(sa_column=Column(pg.NUMERIC(12, 2), nullable=False))
 	status: str
 	issued_at : datetime = Field(default_factory=datetime.now)
 	paid_at : datetime = Field(default=None, nullable=True)
 
+	# Never lazy loaded; query with selectinload(Invoice.booking) to use it
+	booking : Optional["Bookings"] = Relationship(back_populates="invoices", sa_relationship_kwargs={"lazy": "raise"})
+
+
+	def __repr__(self):
+		return f"<Invoice of {self.booking_uid} for {self.amount}>"
+
+class StripeCustomer(SQLModel, table=True):
+	__tablename__ = "stripe_customers"
+
+	email : str = Field(primary_key=True)
+	customer_id : str
+	created_at : datetime = Field(default_factory=datetime.now)
+
+
+	def __repr__(self):
+		return f"<StripeCustomer {self.customer_id} for {self.email}>"
+
+
+
+class StripeEvent(SQLModel, table=True):
+	__tablename__ = "stripe_events"
+	__table_args__ = (
+		Index("ix_stripe_events_pending", "created", postgresql_where=text("processed_at IS NULL")),
+	)
+
+	event_id : str = Field(primary_key=True)
+	type : str
+	payload : dict = Field(sa_column=Column(pg.JSONB, nullable=False))
+	created : datetime
+	received_at : datetime = Field(default_factory=datetime.now)
+	processed_at : Optional[datetime] = Field(default=None, nullable=True)
+	attempts : int = Field(default=0)
+	last_error : Optional[str] = Field(default=None, nullable=True)
+
 
 	def __repr__(self):
-		return f"<Invoice of {self.booking_uid} for {self.amount}>"
\ No newline at end of file
+		return f"<StripeEvent {self.event_id} {self.type}>"
@@ -1,4 +1,4 @@
-from datetime import datetime, timezone
+import asyncio
 from typing import List
 from fastapi import APIRouter, Depends, status, Request
 from fastapi.exceptions import HTTPException
@@ -7,9 +7,10 @@ from src.bookings.service import BookingService
 import stripe
 from src.config import Config
 
-from .schemas import InvoiceCreateModel, InvoiceRequestModel
-from src.db.main import get_session
-from .service import InvoiceService
+from .schemas import InvoiceCreateModel, InvoiceRequestModel, BulkInvoiceRequestModel, BulkInvoiceItemResult, BulkInvoiceResponseModel
+from src.db.main import get_session, unit_of_work
+from .service import InvoiceInProgress, InvoiceService
+from .webhooks import record_stripe_event
 from src.auth.dependencies import AccessTokenBearer, RoleChecker
 
 
@@ -18,9 +19,10 @@ invoice_service = InvoiceService()
 invoice_router = APIRouter()
 booking_service = BookingService()
 
-STRIPE_SECRET_KEY = Config.STRIPE_SECRET_KEY
 STRIPE_WEBHOOK_SECRET = Config.STRIPE_WEBHOOK_SECRET
-stripe.api_key = STRIPE_SECRET_KEY
+
+# Stripe may have acted on a request that failed with one of these
+UNCERTAIN_STRIPE_ERRORS = (asyncio.TimeoutError, stripe.error.APIConnectionError)
 
 admin_role_checker = RoleChecker(['admin'])
 
@@ -47,49 +49,22 @@ async def create_invoice(invoice_data: InvoiceRequestModel, session: AsyncSessio
     if invoice_data.amount <= 0:
         raise HTTPException(status_code=400, detail="Invoice amount must be greater than zero")
 
-    # Step 1: Check if Customer Already Exists in Stripe
-    existing_customers = stripe.Customer.list(email=booking.email).get("data", [])
     client_name = booking.firstName + " " + booking.lastName
-    if existing_customers:
-        customer_id = existing_customers[0]["id"]  # Use existing customer ID
-    else:
-        customer = stripe.Customer.create(
-            email=booking.email,
-            name=client_name
-        )
-        customer_id = customer.id
-
-    # Step 2: Create a Stripe Invoice (Before Adding Items)
-    stripe_invoice = stripe.Invoice.create(
-        customer=customer_id,
-        collection_method="send_invoice",
-        days_until_due=1  # Invoice is due in 7 days
-    )
 
-    # Step 3: Create a Stripe Invoice Item (This must be linked to the same customer & invoice)
-    stripe.InvoiceItem.create(
-        customer=customer_id,
-        invoice=stripe_invoice.id,  # Explicitly attach to the created invoice
-        amount=int(invoice_data.amount * 100),  # Convert dollars to cents
-        currency="cad",
-        description=f"Invoice for Booking #{booking.uid}"
-    )
-
-    # Step 4: **Finalize the Invoice to Make It Payable**
-    finalized_invoice = stripe.Invoice.finalize_invoice(stripe_invoice.id, auto_advance=True)
-
-    # Step 5: **Force Immediate Invoice Send**
+    # A retry of a request that failed here resumes the same Stripe invoice
     try:
-        stripe.Invoice.send_invoice(finalized_invoice.id)  # Ensures email is sent immediately
+        finalized_invoice = await invoice_service.issue_stripe_invoice(session, booking.email, client_name, booking.uid, invoice_data.amount)
+    except UNCERTAIN_STRIPE_ERRORS:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Stripe did not respond in time. Retry to resume the same invoice.")
+    except InvoiceInProgress as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except stripe.error.InvalidRequestError:
         raise HTTPException(status_code=500, detail="Failed to send invoice immediately. Check Stripe dashboard.")
 
-    booking = await booking_service.get_booking(booking_uid,session)
-    await booking_service.quick_update_booking(booking, {"status": "invoiced"}, session)
-    await booking_service.quick_update_booking(booking, {"agreedPrice": str(invoice_data.amount)}, session)
-
-    # Save Invoice Details to Database
-    await invoice_service.create_invoice(session, booking_uid, stripe_invoice.id, invoice_data)
+    # Update the booking and mark the stored draft as sent in one transaction
+    async with unit_of_work(session):
+        await booking_service.quick_update_booking(booking, {"status": "invoiced", "agreedPrice": invoice_data.amount}, session, commit=False)
+        await invoice_service.mark_invoices_issued(session, [finalized_invoice.id], commit=False)
 
     return {
             "message": "Invoice created and sent",
@@ -100,6 +75,72 @@ async def create_invoice(invoice_data: InvoiceRequestModel, session: AsyncSessio
         }
 
 
+@invoice_router.post("/bulk", response_model=BulkInvoiceResponseModel)
+async def create_bulk_invoices(bulk_data: BulkInvoiceRequestModel, session: AsyncSession = Depends(get_session),token_details : dict =Depends(access_token_bearer),_:bool = Depends(admin_role_checker)):
+
+    bookings = await booking_service.get_bookings([item.booking_uid for item in bulk_data.items], session)
+
+    results = [None] * len(bulk_data.items)
+    to_invoice = []
+    seen = set()
+
+    for index, item in enumerate(bulk_data.items):
+        booking = bookings.get(item.booking_uid)
+
+        if item.booking_uid in seen:
+            error = "Booking appears more than once in the request"
+        elif booking is None:
+            error = "Booking not found"
+        elif not booking.email:
+            error = "Client email is required for invoicing"
+        elif item.amount <= 0:
+            error = "Invoice amount must be greater than zero"
+        else:
+            error = None
+            to_invoice.append(index)
+
+        seen.add(item.booking_uid)
+
+        if error:
+            results[index] = BulkInvoiceItemResult(booking_uid=item.booking_uid, status="failed", error=error)
+
+    outcomes = await invoice_service.issue_stripe_invoices(
+        session, [(bookings[bulk_data.items[index].booking_uid], bulk_data.items[index].amount) for index in to_invoice]
+    )
+
+    # Stage every booking update and sent draft, then commit them together
+    async with unit_of_work(session):
+        for index, outcome in zip(to_invoice, outcomes):
+            item = bulk_data.items[index]
+
+            if isinstance(outcome, BaseException):
+                # A timed out item may have been sent; retrying it resumes the same invoice
+                outcome_status = "unknown" if isinstance(outcome, UNCERTAIN_STRIPE_ERRORS) else "failed"
+                results[index] = BulkInvoiceItemResult(booking_uid=item.booking_uid, status=outcome_status, error=str(outcome) or type(outcome).__name__)
+                continue
+
+            booking = bookings[item.booking_uid]
+            await booking_service.quick_update_booking(booking, {"status": "invoiced", "agreedPrice": item.amount}, session, commit=False)
+
+            results[index] = BulkInvoiceItemResult(
+                booking_uid=item.booking_uid,
+                status="invoiced",
+                invoice_id=outcome.id,
+                stripe_invoice_url=outcome.hosted_invoice_url,
+            )
+
+        await invoice_service.mark_invoices_issued(
+            session, [outcome.id for outcome in outcomes if not isinstance(outcome, BaseException)], commit=False
+        )
+
+    counts = {"invoiced": 0, "failed": 0, "unknown": 0}
+
+    for result in results:
+        counts[result.status] += 1
+
+    return {**counts, "results": results}
+
+
 @invoice_router.post("/webhooks/stripe")
 async def stripe_webhook(request: Request, session: AsyncSession = Depends(get_session)):
     payload = await request.body()
@@ -114,44 +155,6 @@ async def stripe_webhook(request: Request, session: AsyncSession = Depends(get_s
     except stripe.error.SignatureVerificationError:
         raise HTTPException(status_code=400, detail="Invalid signature")
 
-    invoice_data = event["data"]["object"]
-    invoice_id = invoice_data["id"]
-    
-    # Find invoice in DB
-    invoice = await invoice_service.get_invoice_by_id(invoice_id,session)
-    
-    booking_uid = invoice.booking_uid
-    booking = await booking_service.get_booking(booking_uid,session)
-    
-    if not invoice:
-        raise HTTPException(status_code=404, detail="Invoice not found in database")
-
-    
-    # Handle "invoice.paid" event
-    if event["type"] == "invoice.paid":
-        # Update invoice status
-        paid_at_timestamp = invoice_data["status_transitions"]["paid_at"]
-        paid_datetime = datetime.utcfromtimestamp(paid_at_timestamp)        
-        invoice_status = "paid"
-        await invoice_service.update_invoice(invoice, {"status": invoice_status}, session)
-        await invoice_service.update_invoice(invoice, {"paid_at": paid_datetime}, session)
-
-        # Update booking status to "confirmed"
-        await booking_service.quick_update_booking(booking, {"status": "confirmed"}, session)
-
-    # Handle "invoice.updated" when status changes to "past_due"
-    elif event["type"] == "invoice.updated":
-        new_status = invoice_data["status"]  # Check latest status
-
-        if new_status == "past_due":
-            invoice.status = "past_due"
-            await invoice_service.update_invoice(invoice, {"status": invoice_status}, session)
-
-            await booking_service.quick_update_booking(booking, {"status": invoice_status}, session)
-
-            # Notify admin & client
-            # send_email(booking.client_email, "Your invoice is past due! Please make payment immediately.")
-            # send_email(admin_email, "A client has an overdue invoice.")
-
+    await record_stripe_event(event, session)
 
     return {"status": "success"}
@@ -1,12 +1,13 @@
 import uuid
 from datetime import datetime
-from typing import List
+from decimal import Decimal
+from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 class InvoiceRequestModel(BaseModel):
     booking_uid: uuid.UUID
-    amount: float
+    amount: Decimal = Field(max_digits=12, decimal_places=2)
 
     model_config = {
         "json_schema_extra": {
@@ -17,10 +18,37 @@ class InvoiceRequestModel(BaseModel):
         }
     }
 
+class BulkInvoiceRequestModel(BaseModel):
+    items: List[InvoiceRequestModel] = Field(min_length=1, max_length=500)
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "items": [
+                    {"booking_uid": "123e4567-e89b-12d3-a456-426614174001", "amount": 99.99},
+                    {"booking_uid": "123e4567-e89b-12d3-a456-426614174002", "amount": 149.50}
+                ]
+            }
+        }
+    }
+
+class BulkInvoiceItemResult(BaseModel):
+    booking_uid: uuid.UUID
+    status: str
+    invoice_id: Optional[str] = None
+    stripe_invoice_url: Optional[str] = None
+    error: Optional[str] = None
+
+class BulkInvoiceResponseModel(BaseModel):
+    invoiced: int
+    failed: int
+    unknown: int
+    results: List[BulkInvoiceItemResult]
+
 class InvoiceCreateModel(BaseModel):
     booking_uid: uuid.UUID
     stripe_invoice_id: str
-    amount: float
+    amount: Decimal
     status: str
 
     model_config = {
@@ -38,7 +66,7 @@ class InvoiceModel(BaseModel):
     uid: uuid.UUID
     booking_uid: uuid.UUID
     stripe_invoice_id: str
-    amount: float
+    amount: Decimal
     status: str
     issued_at: datetime
     paid_at: datetime | None = None
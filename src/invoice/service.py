@@ -1,11 +1,36 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
-from .schemas import InvoiceCreateModel, InvoiceModel, InvoiceRequestModel
+from .schemas import InvoiceCreateModel, InvoiceModel
 from sqlmodel import UUID, select,desc
-from .models import Invoice
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from .models import Invoice, StripeCustomer
+from .stripe_gateway import StripeGateway, stripe_gateway
+import asyncio
 from datetime import datetime
+from decimal import Decimal
+import stripe
+
+from src.config import Config
+from src.db.cache import LRUCache
+
+
+# email -> Stripe customer ID, in front of the stripe_customers table
+stripe_customer_ids = LRUCache(Config.STRIPE_CUSTOMER_CACHE_SIZE)
+
+
+class InvoiceInProgress(Exception):
+    """The booking already has a draft invoice for a different amount."""
+
+
+def idempotency_key(booking_uid: UUID) -> str:
+    """Base of the Stripe idempotency keys used while invoicing a booking."""
+    return f"booking-{booking_uid}"
 
 
 class InvoiceService:
+    def __init__(self, gateway: StripeGateway = stripe_gateway):
+        self.gateway = gateway
+
     # async def create_invoice(self, invoice_data: InvoiceCreateModel, session: AsyncSession):
     #     invoice_dict = invoice_data.model_dump()
                 
@@ -31,26 +56,249 @@ class InvoiceService:
     from src.invoice.models import Invoice 
     from sqlalchemy.ext.asyncio import AsyncSession
 
-    async def create_invoice(self,session: AsyncSession, booking_uid: UUID, stripe_invoice_id: str, invoice_data:InvoiceRequestModel):
-        new_invoice = Invoice(
-            booking_uid=booking_uid,
-            stripe_invoice_id=stripe_invoice_id,
-            amount=invoice_data.amount,
-            status="unpaid"
-        )
+    async def get_draft_invoices(self, booking_uids: list, session: AsyncSession):
+        """ Returns the draft invoice of each booking that has one, keyed by booking uid """
+        query = select(Invoice).where(Invoice.booking_uid.in_(booking_uids), Invoice.status == "draft")
+        result = await session.execute(query)
+
+        return {invoice.booking_uid: invoice for invoice in result.scalars().all()}
 
-        session.add(new_invoice)
+
+    async def save_draft_invoices(self, drafts: list, session: AsyncSession):
+        """ Stores (booking uid, Stripe invoice ID, amount) drafts before they are finalized.
+
+        Committed right away so a retry after a failed finalize or send finds
+        the draft and resumes it instead of invoicing the booking again.
+        """
+        for booking_uid, stripe_invoice_id, amount in drafts:
+            session.add(Invoice(
+                booking_uid=booking_uid,
+                stripe_invoice_id=stripe_invoice_id,
+                amount=amount,
+                status="draft"
+            ))
 
         await session.commit()
 
-        # Return a response
-        return {"message": "Invoice created and sent to client"}
+
+    async def mark_invoices_issued(self, session: AsyncSession, stripe_invoice_ids: list, commit: bool = True):
+        """ Moves sent drafts to unpaid, leaving any a webhook already marked paid alone """
+        statement = (
+            update(Invoice)
+            .where(Invoice.stripe_invoice_id.in_(stripe_invoice_ids), Invoice.status == "draft")
+            .values(status="unpaid")
+        )
+
+        await session.execute(statement)
+
+        if commit:
+            await session.commit()
     
     
-    async def update_invoice(self, invoice:Invoice, invoice_data: dict, session: AsyncSession):
+    async def get_stripe_customer_ids(self, emails: list[str], session: AsyncSession):
+        """ Returns the known Stripe customer ID of each email, from the LRU or one query """
+        customer_ids = {}
+        uncached = []
+
+        for email in emails:
+            customer_id = stripe_customer_ids.get(email)
+
+            if customer_id is None:
+                uncached.append(email)
+            else:
+                customer_ids[email] = customer_id
+
+        if uncached:
+            query = select(StripeCustomer.email, StripeCustomer.customer_id).where(StripeCustomer.email.in_(uncached))
+            result = await session.execute(query)
+
+            for email, customer_id in result.all():
+                stripe_customer_ids.set(email, customer_id)
+                customer_ids[email] = customer_id
+
+        return customer_ids
+
+
+    async def get_stripe_customer_id(self, email: str, session: AsyncSession):
+        customer_ids = await self.get_stripe_customer_ids([email], session)
+
+        return customer_ids.get(email)
+
+
+    async def save_stripe_customer_ids(self, customer_ids: dict, session: AsyncSession):
+        statement = insert(StripeCustomer).values([
+            {"email": email, "customer_id": customer_id, "created_at": datetime.now()}
+            for email, customer_id in customer_ids.items()
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=[StripeCustomer.email], set_={"customer_id": statement.excluded.customer_id}
+        )
+
+        await session.execute(statement)
+        await session.commit()
+
+        for email, customer_id in customer_ids.items():
+            stripe_customer_ids.set(email, customer_id)
+
+
+    async def create_stripe_draft(self, customer_id: str | None, email: str, client_name: str, booking_uid: UUID, amount: Decimal):
+        """ Creates a draft Stripe invoice without touching the database.
+
+        Returns the draft and the customer it was billed to, which differs
+        from ``customer_id`` when that was unknown or no longer exists.
+        """
+        description = f"Invoice for Booking #{booking_uid}"
+        key = idempotency_key(booking_uid)
+        draft = None
+
+        if customer_id is not None:
+            try:
+                draft = await self.gateway.create_draft_invoice(customer_id, amount, description, key)
+
+            except stripe.error.InvalidRequestError as e:
+                # The remembered customer was deleted in Stripe since it was cached
+                if e.code != "resource_missing" or e.param != "customer":
+                    raise
+
+                customer_id = None
+                # The failed request is cached under the first key, so retry under another
+                key = f"{key}-recreated"
+
+        if customer_id is None:
+            customer_id = await self.gateway.find_or_create_customer(email, client_name, f"{key}-customer")
+            draft = await self.gateway.create_draft_invoice(customer_id, amount, description, key)
+
+        return draft, customer_id
+
+
+    async def finalize_and_send(self, stripe_invoice_id: str, booking_uid: UUID):
+        """ Finalizes and sends a draft, returning the sent invoice """
+        key = idempotency_key(booking_uid)
+
+        await self.gateway.finalize_invoice(stripe_invoice_id, f"{key}-finalize")
+
+        return await self.gateway.send_invoice(stripe_invoice_id, f"{key}-send")
+
+
+    async def issue_stripe_invoice(self, session: AsyncSession, email: str, client_name: str, booking_uid: UUID, amount: Decimal):
+        """ Creates, finalizes and sends a Stripe invoice, returning the sent invoice.
+
+        Resumes the booking's draft when an earlier attempt stored one.
+        """
+        drafts = await self.get_draft_invoices([booking_uid], session)
+        draft = drafts.get(booking_uid)
+
+        if draft is not None:
+            if draft.amount != amount:
+                raise InvoiceInProgress(f"An invoice for {draft.amount} is already in progress for this booking")
+
+            return await self.finalize_and_send(draft.stripe_invoice_id, booking_uid)
+
+        known_customer_id = await self.get_stripe_customer_id(email, session)
+
+        stripe_draft, customer_id = await self.create_stripe_draft(known_customer_id, email, client_name, booking_uid, amount)
+
+        if customer_id != known_customer_id:
+            await self.save_stripe_customer_ids({email: customer_id}, session)
+
+        await self.save_draft_invoices([(booking_uid, stripe_draft.id, amount)], session)
+
+        return await self.finalize_and_send(stripe_draft.id, booking_uid)
+
+
+    async def issue_stripe_invoices(self, session: AsyncSession, bookings_and_amounts: list):
+        """ Invoices many (booking, amount) pairs with at most STRIPE_BULK_CONCURRENCY Stripe calls in flight.
+
+        Every new draft is stored before any is finalized, as in
+        ``issue_stripe_invoice``. Returns, in order, the sent invoice or the
+        exception raised for each pair.
+        """
+        semaphore = asyncio.Semaphore(Config.STRIPE_BULK_CONCURRENCY)
+
+        drafts = await self.get_draft_invoices([booking.uid for booking, _ in bookings_and_amounts], session)
+        to_draft = [(booking, amount) for booking, amount in bookings_and_amounts if booking.uid not in drafts]
+
+        names = {booking.email: booking.firstName + " " + booking.lastName for booking, _ in to_draft}
+        first_bookings = {}
+
+        for booking, _ in to_draft:
+            first_bookings.setdefault(booking.email, booking.uid)
+
+        known_customer_ids = await self.get_stripe_customer_ids(list(names), session)
+
+        async def resolve(email):
+            async with semaphore:
+                key = idempotency_key(first_bookings[email])
+                return await self.gateway.find_or_create_customer(email, names[email], f"{key}-customer")
+
+        # Resolve each new email once up front so parallel invoices for the
+        # same client cannot create duplicate Stripe customers
+        new_emails = [email for email in names if email not in known_customer_ids]
+        resolved = await asyncio.gather(*(resolve(email) for email in new_emails), return_exceptions=True)
+
+        customer_ids = dict(known_customer_ids)
+        failed_emails = {}
+
+        for email, outcome in zip(new_emails, resolved):
+            if isinstance(outcome, BaseException):
+                failed_emails[email] = outcome
+            else:
+                customer_ids[email] = outcome
+
+        async def create_draft(booking, amount):
+            if booking.email in failed_emails:
+                raise failed_emails[booking.email]
+
+            async with semaphore:
+                return await self.create_stripe_draft(customer_ids[booking.email], booking.email, names[booking.email], booking.uid, amount)
+
+        draft_outcomes = await asyncio.gather(
+            *(create_draft(booking, amount) for booking, amount in to_draft),
+            return_exceptions=True,
+        )
+
+        stripe_invoice_ids = {booking_uid: draft.stripe_invoice_id for booking_uid, draft in drafts.items()}
+        draft_amounts = {booking_uid: draft.amount for booking_uid, draft in drafts.items()}
+        failures = {}
+        new_drafts = []
+
+        for (booking, amount), outcome in zip(to_draft, draft_outcomes):
+            if isinstance(outcome, BaseException):
+                failures[booking.uid] = outcome
+            else:
+                customer_ids[booking.email] = outcome[1]
+                stripe_invoice_ids[booking.uid] = outcome[0].id
+                new_drafts.append((booking.uid, outcome[0].id, amount))
+
+        changed_customer_ids = {email: customer_id for email, customer_id in customer_ids.items() if known_customer_ids.get(email) != customer_id}
+
+        if changed_customer_ids:
+            await self.save_stripe_customer_ids(changed_customer_ids, session)
+
+        if new_drafts:
+            await self.save_draft_invoices(new_drafts, session)
+
+        async def send(booking, amount):
+            if booking.uid in failures:
+                raise failures[booking.uid]
+
+            if booking.uid in draft_amounts and draft_amounts[booking.uid] != amount:
+                raise InvoiceInProgress(f"An invoice for {draft_amounts[booking.uid]} is already in progress for this booking")
+
+            async with semaphore:
+                return await self.finalize_and_send(stripe_invoice_ids[booking.uid], booking.uid)
+
+        return await asyncio.gather(
+            *(send(booking, amount) for booking, amount in bookings_and_amounts),
+            return_exceptions=True,
+        )
+
+
+    async def update_invoice(self, invoice:Invoice, invoice_data: dict, session: AsyncSession, commit: bool = True):
 		
         for k, v in invoice_data.items():
             setattr(invoice, k, v)
 
-        await session.commit()
+        if commit:
+            await session.commit()
         return invoice
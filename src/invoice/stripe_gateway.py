@@ -0,0 +1,103 @@
+import asyncio
+from decimal import Decimal
+from typing import Optional
+
+import stripe
+
+from src.config import Config
+
+
+class StripeGateway:
+    """Async access to the Stripe calls used for invoicing.
+
+    Requests go through the SDK's async methods on a pooled httpx client, so
+    waiting on Stripe never blocks the event loop. Every call is bounded by
+    ``timeout`` seconds. ``api_base`` can point the client at a local fake
+    such as stripe-mock.
+
+    Calls that create or change something take an idempotency key, so a
+    request retried after a timeout returns what the first attempt did
+    instead of creating a second customer, invoice or line.
+    """
+
+    def __init__(self, api_key: str, timeout: float, api_base: Optional[str] = None) -> None:
+        base_addresses = {"api": api_base} if api_base else {}
+
+        self.timeout = timeout
+        self.client = stripe.StripeClient(
+            api_key,
+            http_client=stripe.HTTPXClient(timeout=timeout),
+            base_addresses=base_addresses,
+            max_network_retries=Config.STRIPE_MAX_NETWORK_RETRIES,
+        )
+
+    async def _call(self, request):
+        return await asyncio.wait_for(request, self.timeout)
+
+    async def find_or_create_customer(self, email: str, name: str, idempotency_key: str) -> str:
+        existing_customers = await self._call(
+            self.client.customers.list_async(params={"email": email, "limit": 1})
+        )
+
+        if existing_customers.data:
+            return existing_customers.data[0].id
+
+        customer = await self._call(
+            self.client.customers.create_async(
+                params={"email": email, "name": name},
+                options={"idempotency_key": idempotency_key},
+            )
+        )
+
+        return customer.id
+
+    async def create_draft_invoice(self, customer_id: str, amount: Decimal, description: str, idempotency_key: str) -> stripe.Invoice:
+        """Creates a draft invoice with a single line.
+
+        The invoice and its line use ``idempotency_key`` with ``-invoice`` and
+        ``-item`` appended.
+        """
+        stripe_invoice = await self._call(
+            self.client.invoices.create_async(
+                params={
+                    "customer": customer_id,
+                    "collection_method": "send_invoice",
+                    "days_until_due": 1,
+                },
+                options={"idempotency_key": f"{idempotency_key}-invoice"},
+            )
+        )
+
+        await self._call(
+            self.client.invoice_items.create_async(
+                params={
+                    "customer": customer_id,
+                    "invoice": stripe_invoice.id,
+                    "amount": int(round(amount * 100)),  # Convert dollars to cents
+                    "currency": "cad",
+                    "description": description,
+                },
+                options={"idempotency_key": f"{idempotency_key}-item"},
+            )
+        )
+
+        return stripe_invoice
+
+    async def finalize_invoice(self, invoice_id: str, idempotency_key: str) -> stripe.Invoice:
+        return await self._call(
+            self.client.invoices.finalize_invoice_async(
+                invoice_id, params={"auto_advance": True}, options={"idempotency_key": idempotency_key}
+            )
+        )
+
+    async def send_invoice(self, invoice_id: str, idempotency_key: str) -> stripe.Invoice:
+        return await self._call(
+            self.client.invoices.send_invoice_async(invoice_id, options={"idempotency_key": idempotency_key})
+        )
+
+
+stripe_gateway = StripeGateway(
+    Config.STRIPE_SECRET_KEY,
+    timeout=Config.STRIPE_TIMEOUT,
+    api_base=Config.STRIPE_API_BASE,
+)
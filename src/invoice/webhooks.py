@@ -0,0 +1,179 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.bookings.service import BookingService
+from src.config import Config
+from src.db.main import SessionLocal, engine, unit_of_work
+from .models import StripeEvent
+from .service import InvoiceService
+
+# pg advisory lock key held by the one worker that applies events
+STRIPE_EVENTS_LOCK = 7_120_413
+
+invoice_service = InvoiceService()
+booking_service = BookingService()
+
+
+class InvoiceNotFound(Exception):
+    """The event's invoice is not in the database, possibly because it is not committed yet."""
+
+
+async def record_stripe_event(event: dict, session: AsyncSession) -> None:
+    """Stores a verified event once; redeliveries of the same event ID are ignored."""
+    statement = insert(StripeEvent).values(
+        event_id=event["id"],
+        type=event["type"],
+        payload=event,
+        created=datetime.utcfromtimestamp(event["created"]),
+        received_at=datetime.now(),
+        attempts=0,
+    ).on_conflict_do_nothing(index_elements=[StripeEvent.event_id])
+
+    await session.execute(statement)
+    await session.commit()
+
+
+def handles_event(event_type: str, invoice_data: dict) -> bool:
+    return event_type == "invoice.paid" or (event_type == "invoice.updated" and invoice_data.get("status") == "past_due")
+
+
+async def apply_stripe_event(stripe_event: StripeEvent, session: AsyncSession) -> None:
+    """Stages the invoice and booking changes for one event without committing."""
+    invoice_data = stripe_event.payload["data"]["object"]
+
+    # Nothing to apply; skip the lookup so the event cannot wait on a missing invoice
+    if not handles_event(stripe_event.type, invoice_data):
+        return
+
+    invoice = await invoice_service.get_invoice_by_id(invoice_data["id"], session)
+
+    if invoice is None:
+        raise InvoiceNotFound(f"Invoice {invoice_data['id']} not found in database")
+
+    booking = await booking_service.get_booking(invoice.booking_uid, session)
+
+    # Handle "invoice.paid" event
+    if stripe_event.type == "invoice.paid":
+        paid_at_timestamp = invoice_data["status_transitions"]["paid_at"]
+
+        await invoice_service.update_invoice(invoice, {
+            "status": "paid",
+            "paid_at": datetime.utcfromtimestamp(paid_at_timestamp),
+        }, session, commit=False)
+
+        await booking_service.quick_update_booking(booking, {"status": "confirmed"}, session, commit=False)
+
+    # Handle "invoice.updated" when status changes to "past_due"
+    elif stripe_event.type == "invoice.updated" and invoice_data["status"] == "past_due":
+        await invoice_service.update_invoice(invoice, {"status": "past_due"}, session, commit=False)
+
+        await booking_service.quick_update_booking(booking, {"status": "past_due"}, session, commit=False)
+
+
+async def record_failure(session: AsyncSession, event_id: str, error: Exception, give_up: bool) -> None:
+    """Counts a failed attempt at an event; it is marked processed once ``give_up`` is set."""
+    stripe_event = await session.get(StripeEvent, event_id)
+    stripe_event.attempts += 1
+    stripe_event.last_error = str(error)
+
+    if give_up:
+        stripe_event.processed_at = datetime.now()
+
+    await session.commit()
+
+
+async def process_pending_stripe_events() -> int:
+    """Applies the oldest unprocessed events, one transaction each, in creation order.
+
+    Stops at the first failure so later events are not applied before it; the
+    failed event is retried on the next pass until it reaches
+    STRIPE_EVENT_MAX_ATTEMPTS. An event whose invoice is not in the database
+    yet only holds back later events for that invoice, and is retried until it
+    is STRIPE_EVENT_MISSING_INVOICE_TIMEOUT seconds old. Returns how many
+    events were applied.
+    """
+    applied = 0
+    waiting_invoices = set()
+
+    async with SessionLocal() as session:
+        statement = (
+            select(StripeEvent.event_id)
+            .where(StripeEvent.processed_at.is_(None))
+            .order_by(StripeEvent.created, StripeEvent.received_at)
+            .limit(Config.STRIPE_EVENT_BATCH_SIZE)
+        )
+        result = await session.exec(statement)
+        event_ids = result.all()
+
+    for event_id in event_ids:
+        async with SessionLocal() as session:
+            stripe_event = await session.get(StripeEvent, event_id)
+            invoice_id = stripe_event.payload["data"]["object"].get("id")
+            attempts, received_at = stripe_event.attempts, stripe_event.received_at
+
+            if invoice_id in waiting_invoices:
+                continue
+
+            try:
+                async with unit_of_work(session):
+                    await apply_stripe_event(stripe_event, session)
+                    stripe_event.processed_at = datetime.now()
+
+                applied += 1
+
+            except InvoiceNotFound as e:
+                waiting_invoices.add(invoice_id)
+                expired = datetime.now() - received_at > timedelta(seconds=Config.STRIPE_EVENT_MISSING_INVOICE_TIMEOUT)
+
+                if expired:
+                    logging.warning(f"Giving up on Stripe event {event_id}: {e}")
+
+                await record_failure(session, event_id, e, give_up=expired)
+
+            except Exception as e:
+                logging.exception(e)
+                await record_failure(session, event_id, e, give_up=attempts + 1 >= Config.STRIPE_EVENT_MAX_ATTEMPTS)
+                break
+
+    return applied
+
+
+async def consume_stripe_events() -> None:
+    """Runs in every API worker; only the holder of the advisory lock consumes."""
+    while True:
+        try:
+            async with engine.connect() as connection:
+                has_lock = await connection.scalar(select(func.pg_try_advisory_lock(STRIPE_EVENTS_LOCK)))
+                # The lock is session level, so it outlives the transaction
+                await connection.commit()
+
+                try:
+                    while has_lock:
+                        # Fails if the connection, and with it the lock, was lost
+                        await connection.execute(text("SELECT 1"))
+                        await connection.commit()
+
+                        processed = await process_pending_stripe_events()
+
+                        if processed < Config.STRIPE_EVENT_BATCH_SIZE:
+                            await asyncio.sleep(Config.STRIPE_EVENT_POLL_INTERVAL)
+
+                finally:
+                    # Closing the connection releases the lock; back in the pool it would keep holding it
+                    if has_lock:
+                        await connection.invalidate()
+
+            await asyncio.sleep(Config.STRIPE_EVENT_POLL_INTERVAL)
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as e:
+            logging.error(str(e))
+            await asyncio.sleep(Config.STRIPE_EVENT_POLL_INTERVAL)
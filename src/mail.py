@@ -1,4 +1,6 @@
 from fastapi_mail import FastMail, ConnectionConfig, MessageSchema, MessageType
+from jinja2 import Template, nodes
+from markupsafe import escape
 from src.config import Config
 from pathlib import Path
 
@@ -23,6 +25,95 @@ mail_config = ConnectionConfig(
 mail = FastMail(config=mail_config)
 
 
+MAIL_TEMPLATES = (
+    "booking-email.html",
+    "cancel_reject.html",
+    "verify-email.html",
+    "reset-password.html",
+)
+
+
+class CompiledTemplate:
+    """A template split once into its static text and variable slots.
+
+    Templates made only of literal text and ``{{ name }}`` expressions are
+    rendered by joining the cached static parts with the HTML-escaped
+    values, which skips Jinja entirely. Anything else falls back to the
+    compiled Jinja template, which autoescapes the same way.
+    """
+
+    def __init__(self, template: Template, source: str) -> None:
+        self.template = template
+        self.parts = self._split(template.environment.parse(source))
+
+    @staticmethod
+    def _split(tree: nodes.Template) -> list[tuple[bool, str]] | None:
+        parts = []
+
+        for node in tree.body:
+            if not isinstance(node, nodes.Output):
+                return None
+
+            for child in node.nodes:
+                if isinstance(child, nodes.TemplateData):
+                    parts.append((False, child.data))
+                elif isinstance(child, nodes.Name):
+                    parts.append((True, child.name))
+                else:
+                    return None
+
+        return parts
+
+    def render(self, context: dict) -> str:
+        if self.parts is None:
+            return self.template.render(**context)
+
+        return "".join(
+            str(escape(context.get(value, ""))) if is_variable else value
+            for is_variable, value in self.parts
+        )
+
+
+class MailRenderer:
+    """Loads and compiles the mail templates once per process."""
+
+    def __init__(self, template_names: tuple[str, ...]) -> None:
+        environment = mail_config.template_engine()
+        # Booking names come from an anonymous form, so values must never become markup
+        environment.autoescape = True
+        self.templates = {}
+
+        for name in template_names:
+            source, _, _ = environment.loader.get_source(environment, name)
+            self.templates[name] = CompiledTemplate(environment.get_template(name), source)
+
+    def render(self, template_name: str, context: dict) -> str:
+        return self.templates[template_name].render(context)
+
+    def render_many(self, mails: list) -> list:
+        """Renders a batch of queued mails in one pass.
+
+        A mail that failed before rendering is passed in as its exception; it,
+        and any mail that fails to render, gets an exception in place of its body.
+        """
+        bodies = []
+
+        for mail in mails:
+            try:
+                if isinstance(mail, Exception):
+                    raise mail
+
+                bodies.append(self.render(mail["template_name"], mail["context"]))
+
+            except Exception as e:
+                bodies.append(e)
+
+        return bodies
+
+
+mail_renderer = MailRenderer(MAIL_TEMPLATES)
+
+
 def create_message(recipients: list[str], subject: str, template_name: str, context: dict):
 
     message = MessageSchema(
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import time
+import uuid
+
+import redis.asyncio as aioredis
+
+from src.config import Config
+
+OUTBOUND_KEY = "mail:outbound"
+PROCESSING_KEY = "mail:processing"
+CONSUMER_KEY = "mail:consumer"
+RETRY_KEY = "mail:retry"
+DEAD_LETTER_KEY = "mail:dead"
+
+# A worker whose heartbeat is this old is considered gone, and its reserved mail is requeued
+CONSUMER_TTL = 60
+
+
+def build_mail(recipients: list[str], subject: str, template_name: str, context: dict) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "recipients": recipients,
+        "subject": subject,
+        "template_name": template_name,
+        "context": context,
+        "attempts": 0,
+    }
+
+
+class RedisMailQueue:
+    """Durable outbound mail queue, safe to consume from several workers.
+
+    Each consumer moves the messages it reserves to its own processing list
+    and keeps a heartbeat key alive while it runs. Messages held by a
+    consumer whose heartbeat expired are requeued by the others. Failed
+    messages wait in a sorted set scored by when they are due again.
+    """
+
+    def __init__(self, client: aioredis.Redis) -> None:
+        self.client = client
+        self.consumer_id = uuid.uuid4().hex
+        self.processing_key = f"{PROCESSING_KEY}:{self.consumer_id}"
+
+    async def heartbeat(self) -> None:
+        await self.client.set(f"{CONSUMER_KEY}:{self.consumer_id}", 1, ex=CONSUMER_TTL)
+
+    async def enqueue(self, mail: dict) -> None:
+        await self.client.lpush(OUTBOUND_KEY, json.dumps(mail, default=str))
+
+    async def reserve(self, batch_size: int, timeout: int) -> list[str]:
+        first = await self.client.blmove(OUTBOUND_KEY, self.processing_key, timeout, "RIGHT", "LEFT")
+
+        if first is None:
+            return []
+
+        batch = [first]
+
+        while len(batch) < batch_size:
+            raw = await self.client.lmove(OUTBOUND_KEY, self.processing_key, "RIGHT", "LEFT")
+
+            if raw is None:
+                break
+
+            batch.append(raw)
+
+        return batch
+
+    async def ack(self, raw: str) -> None:
+        await self.client.lrem(self.processing_key, 1, raw)
+
+    async def retry(self, raw: str, mail: dict, delay: float) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.zadd(RETRY_KEY, {json.dumps(mail, default=str): time.time() + delay})
+            pipe.lrem(self.processing_key, 1, raw)
+            await pipe.execute()
+
+    async def dead_letter(self, raw: str, mail: dict | None) -> None:
+        """Moves a message to the dead letters; without ``mail`` it is kept as reserved."""
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.lpush(DEAD_LETTER_KEY, raw if mail is None else json.dumps(mail, default=str))
+            pipe.lrem(self.processing_key, 1, raw)
+            await pipe.execute()
+
+    async def promote_due_retries(self) -> None:
+        for raw in await self.client.zrangebyscore(RETRY_KEY, "-inf", time.time()):
+            # Only the caller that removes the entry requeues it
+            if await self.client.zrem(RETRY_KEY, raw):
+                await self.client.lpush(OUTBOUND_KEY, raw)
+
+    async def recover(self) -> None:
+        """Requeues the mail reserved by consumers that stopped sending heartbeats."""
+        # The bare key is the processing list of workers from before consumers had their own
+        keys = [PROCESSING_KEY]
+
+        async for key in self.client.scan_iter(match=f"{PROCESSING_KEY}:*"):
+            keys.append(key)
+
+        for key in keys:
+            consumer_id = key.rpartition(":")[2]
+
+            if key != PROCESSING_KEY and await self.client.exists(f"{CONSUMER_KEY}:{consumer_id}"):
+                continue
+
+            while await self.client.lmove(key, OUTBOUND_KEY, "RIGHT", "RIGHT") is not None:
+                pass
+
+
+class LocalMailQueue:
+    """In-process stand-in for RedisMailQueue, for tests and local runs.
+
+    The API drains it with a mail worker task of its own; anything still
+    queued when the process stops is lost.
+    """
+
+    def __init__(self) -> None:
+        self.outbound: asyncio.Queue[str] = asyncio.Queue()
+        self.processing: list[str] = []
+        self.retrying: list[tuple[float, str]] = []
+        self.dead: list[str] = []
+
+    async def heartbeat(self) -> None:
+        pass
+
+    async def enqueue(self, mail: dict) -> None:
+        await self.outbound.put(json.dumps(mail, default=str))
+
+    async def reserve(self, batch_size: int, timeout: int) -> list[str]:
+        try:
+            batch = [await asyncio.wait_for(self.outbound.get(), timeout)]
+        except asyncio.TimeoutError:
+            return []
+
+        while len(batch) < batch_size and not self.outbound.empty():
+            batch.append(self.outbound.get_nowait())
+
+        self.processing.extend(batch)
+        return batch
+
+    async def ack(self, raw: str) -> None:
+        self.processing.remove(raw)
+
+    async def retry(self, raw: str, mail: dict, delay: float) -> None:
+        self.retrying.append((time.time() + delay, json.dumps(mail, default=str)))
+        self.processing.remove(raw)
+
+    async def dead_letter(self, raw: str, mail: dict | None) -> None:
+        self.dead.append(raw if mail is None else json.dumps(mail, default=str))
+        self.processing.remove(raw)
+
+    async def promote_due_retries(self) -> None:
+        now = time.time()
+
+        for due_at, raw in [entry for entry in self.retrying if entry[0] <= now]:
+            self.retrying.remove((due_at, raw))
+            await self.outbound.put(raw)
+
+    async def recover(self) -> None:
+        while self.processing:
+            await self.outbound.put(self.processing.pop())
+
+
+if Config.MAIL_QUEUE_BACKEND == "local":
+    mail_queue = LocalMailQueue()
+else:
+    mail_queue = RedisMailQueue(aioredis.from_url(Config.REDIS_URL, decode_responses=True))
+
+
+async def enqueue_mail(recipients: list[str], subject: str, template_name: str, context: dict) -> None:
+    await mail_queue.enqueue(build_mail(recipients, subject, template_name, context))
@@ -0,0 +1,167 @@
+"""Drains the outbound mail queue.
+
+Run one or more instances next to the API, each as its own process; each
+sends with MAIL_WORKER_CONNECTIONS parallel SMTP sessions:
+
+    python -m src.mail_worker
+
+With MAIL_QUEUE_BACKEND=local the API runs it as a task instead.
+"""
+import asyncio
+import json
+import logging
+import time
+from email.message import EmailMessage
+from email.utils import formataddr
+
+import aiosmtplib
+
+from src.config import Config
+from src.mail import mail_config, mail_renderer
+from src.mail_queue import CONSUMER_TTL, mail_queue
+
+RESERVE_TIMEOUT = 5
+MAX_RETRY_DELAY = 600
+
+
+class SMTPConnectionPool:
+    """Keeps a fixed number of SMTP sessions open and reconnects them on demand."""
+
+    def __init__(self, size: int) -> None:
+        self.idle: asyncio.Queue[aiosmtplib.SMTP] = asyncio.Queue()
+
+        for _ in range(size):
+            self.idle.put_nowait(self._new_client())
+
+    def _new_client(self) -> aiosmtplib.SMTP:
+        credentials = {}
+
+        if mail_config.USE_CREDENTIALS:
+            credentials = {
+                "username": mail_config.MAIL_USERNAME,
+                "password": mail_config.MAIL_PASSWORD.get_secret_value(),
+            }
+
+        return aiosmtplib.SMTP(
+            hostname=mail_config.MAIL_SERVER,
+            port=mail_config.MAIL_PORT,
+            use_tls=mail_config.MAIL_SSL_TLS,
+            start_tls=mail_config.MAIL_STARTTLS,
+            validate_certs=mail_config.VALIDATE_CERTS,
+            **credentials,
+        )
+
+    async def send(self, message: EmailMessage) -> None:
+        client = await self.idle.get()
+
+        try:
+            if not client.is_connected:
+                await client.connect()
+
+            await client.send_message(message)
+
+        except Exception:
+            client.close()
+            raise
+
+        finally:
+            self.idle.put_nowait(client)
+
+    async def close(self) -> None:
+        while not self.idle.empty():
+            client = self.idle.get_nowait()
+
+            if client.is_connected:
+                await client.quit()
+
+
+def parse_mail(raw: str) -> dict | Exception:
+    try:
+        return json.loads(raw)
+    except ValueError as e:
+        return e
+
+
+def build_email(mail: dict, html: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr((mail_config.MAIL_FROM_NAME, mail_config.MAIL_FROM))
+    message["To"] = ", ".join(mail["recipients"])
+    message["Subject"] = mail["subject"]
+    message.set_content(html, subtype="html")
+
+    return message
+
+
+async def deliver(pool: SMTPConnectionPool, raw: str, mail: dict | Exception, html: str | Exception) -> None:
+    try:
+        if isinstance(html, Exception):
+            raise html
+
+        message = build_email(mail, html)
+
+    except Exception as e:
+        # Retrying cannot fix a malformed message or an unknown template
+        logging.error(f"Dead-lettering mail that cannot be built: {e}")
+        await mail_queue.dead_letter(raw, None)
+        return
+
+    try:
+        await pool.send(message)
+
+    except Exception as e:
+        mail["attempts"] += 1
+
+        if mail["attempts"] >= Config.MAIL_MAX_ATTEMPTS:
+            logging.error(f"Giving up on mail {mail['id']}: {e}")
+            await mail_queue.dead_letter(raw, mail)
+            return
+
+        delay = min(Config.MAIL_RETRY_BACKOFF * 2 ** (mail["attempts"] - 1), MAX_RETRY_DELAY)
+        logging.warning(f"Mail {mail['id']} failed, retrying in {delay}s: {e}")
+        await mail_queue.retry(raw, mail, delay)
+        return
+
+    await mail_queue.ack(raw)
+
+
+async def keep_alive() -> None:
+    """Refreshes this worker's heartbeat so other workers leave its reserved mail alone."""
+    while True:
+        try:
+            await mail_queue.heartbeat()
+        except Exception as e:
+            logging.error(str(e))
+
+        await asyncio.sleep(CONSUMER_TTL / 3)
+
+
+async def run() -> None:
+    pool = SMTPConnectionPool(Config.MAIL_WORKER_CONNECTIONS)
+
+    await mail_queue.heartbeat()
+    heartbeat = asyncio.create_task(keep_alive())
+    recovered_at = None
+
+    try:
+        while True:
+            # Requeue whatever workers that stopped without acking were holding
+            if recovered_at is None or time.monotonic() - recovered_at >= CONSUMER_TTL:
+                await mail_queue.recover()
+                recovered_at = time.monotonic()
+
+            await mail_queue.promote_due_retries()
+
+            batch = await mail_queue.reserve(Config.MAIL_BATCH_SIZE, RESERVE_TIMEOUT)
+            mails = [parse_mail(raw) for raw in batch]
+            bodies = mail_renderer.render_many(mails)
+
+            await asyncio.gather(*(deliver(pool, *item) for item in zip(batch, mails, bodies)))
+
+    finally:
+        heartbeat.cancel()
+        await pool.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run())